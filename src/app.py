@@ -2,22 +2,40 @@
 Creative Automation Pipeline - Gradio Interface
 """
 import os
+import sys
 import json
+import argparse
+import sqlite3
+from collections import OrderedDict
+from contextlib import closing
+import hashlib
+import unicodedata
 from pathlib import Path
 import gradio as gr
-from typing import List, Tuple, Optional
+from typing import List, Tuple, Optional, Any, Callable, Iterator, Mapping
+from types import MappingProxyType
 from dotenv import load_dotenv, set_key
 from google import genai
 from google.genai import types
+from google.genai import errors as genai_errors
+import httpx
 import yaml
 from datetime import datetime
-from PIL import Image
+from PIL import Image, ImageChops, ImageDraw, ImageFilter, ImageFont, ImageOps, ImageStat, features
 from io import BytesIO
 import plotly.graph_objects as go
 import plotly.express as px
 from deep_translator import GoogleTranslator
 import random
+import socket
 import string
+import uuid
+import threading
+import multiprocessing
+import time
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial, wraps
 
 # Load environment variables
 load_dotenv()
@@ -27,6 +45,89 @@ PRODUCTS_DIR = Path("products")
 CONFIG_DIR = Path("config")
 ENV_FILE = Path(".env")
 
+# Image generation model
+IMAGE_MODEL = "gemini-2.5-flash-image"
+
+# Maximum number of image generation calls in flight at once (shared by all handlers)
+MAX_CONCURRENT_GENERATIONS = int(os.getenv("MAX_CONCURRENT_GENERATIONS", "4"))
+
+# Maximum number of ad compositions generated in parallel within one run
+MAX_PARALLEL_AD_GENERATIONS = int(os.getenv("MAX_PARALLEL_AD_GENERATIONS", "4"))
+
+# On-disk cache of generated images, keyed by a hash of the full request
+GENERATION_CACHE_DIR = Path(os.getenv("GENERATION_CACHE_DIR", ".cache/generations"))
+GENERATION_CACHE_MAX_MB = int(os.getenv("GENERATION_CACHE_MAX_MB", "1024"))
+
+# Product photos are downscaled and re-encoded once before being sent as references
+REFERENCE_CACHE_DIR = Path(os.getenv("REFERENCE_CACHE_DIR", ".cache/references"))
+REFERENCE_MAX_EDGE = int(os.getenv("REFERENCE_MAX_EDGE", "1024"))
+REFERENCE_JPEG_QUALITY = 90
+REFERENCE_MEMORY_CACHE_MB = 64
+
+# Small WebP previews shown in galleries instead of full-resolution images
+THUMBNAIL_DIR = Path(os.getenv("THUMBNAIL_DIR", ".cache/thumbnails"))
+THUMBNAIL_MAX_EDGE = int(os.getenv("THUMBNAIL_MAX_EDGE", "384"))
+THUMBNAIL_QUALITY = 80
+
+# Output format per asset type: png, webp, webp-lossless or jpeg, with optional ":quality"
+OUTPUT_FORMATS = {
+    "products": os.getenv("OUTPUT_FORMAT_PRODUCTS", "png"),
+    "environments": os.getenv("OUTPUT_FORMAT_ENVIRONMENTS", "png"),
+    "ads": os.getenv("OUTPUT_FORMAT_ADS", "jpeg:92"),
+    # Intermediate renders (ad bases, masters, contact sheets) stay lossless: final assets are derived from them
+    "intermediate": "png"
+}
+OUTPUT_KEEP_MASTERS = os.getenv("OUTPUT_KEEP_MASTERS", "false").lower() in ("1", "true", "yes")
+
+# Worker processes for decoding/encoding generated images (0 encodes on the calling thread)
+# and how many images may be queued for them before generation threads wait
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+IMAGE_QUEUE_SIZE = int(os.getenv("IMAGE_QUEUE_SIZE", str(max(1, IMAGE_WORKERS) * 2)))
+
+# Write model image bytes as-is when they are already in the asset's output format
+OUTPUT_PASSTHROUGH = os.getenv("OUTPUT_PASSTHROUGH", "true").lower() in ("1", "true", "yes")
+
+# Ads: generate one text-free base per aspect ratio and render each message locally
+AD_TEXT_OVERLAY = os.getenv("AD_TEXT_OVERLAY", "false").lower() in ("1", "true", "yes")
+AD_FONT_DIR = Path(os.getenv("AD_FONT_DIR", "fonts"))
+# Ads: generate one master render and derive the other aspect ratios locally
+AD_REFRAME = os.getenv("AD_REFRAME", "false").lower() in ("1", "true", "yes")
+
+# Product views and environments: request one grid image and slice it locally
+CONTACT_SHEET_MODE = os.getenv("CONTACT_SHEET_MODE", "false").lower() in ("1", "true", "yes")
+CONTACT_SHEET_TILE_SIZE = int(os.getenv("CONTACT_SHEET_TILE_SIZE", "1024"))
+
+# Ads: composite the selected logo locally (into a corner) instead of sending it to the model
+AD_LOGO_OVERLAY = os.getenv("AD_LOGO_OVERLAY", "true").lower() in ("1", "true", "yes")
+AD_LOGO_CORNER = os.getenv("AD_LOGO_CORNER", "bottom-right").strip().lower()
+AD_LOGO_SCALE = float(os.getenv("AD_LOGO_SCALE", "0.16"))
+LOGO_CACHE_DIR = Path(os.getenv("LOGO_CACHE_DIR", ".cache/logos"))
+
+# Durable job queue used to resume interrupted generation runs
+JOB_DB_PATH = Path(os.getenv("JOB_DB_PATH", "outputs/jobs.sqlite3"))
+AUTO_RESUME_JOBS = os.getenv("AUTO_RESUME_JOBS", "true").lower() in ("1", "true", "yes")
+
+# Persistent translation cache (successful and failed lookups)
+TRANSLATION_CACHE_PATH = Path(os.getenv("TRANSLATION_CACHE_PATH", ".cache/translations.sqlite3"))
+TRANSLATION_CACHE_TTL_DAYS = float(os.getenv("TRANSLATION_CACHE_TTL_DAYS", "30"))
+TRANSLATION_NEGATIVE_TTL_SECONDS = float(os.getenv("TRANSLATION_NEGATIVE_TTL_SECONDS", "300"))
+
+# Concurrent translation across a region's languages
+MAX_CONCURRENT_TRANSLATIONS = int(os.getenv("MAX_CONCURRENT_TRANSLATIONS", "8"))
+TRANSLATION_TIMEOUT_SECONDS = float(os.getenv("TRANSLATION_TIMEOUT_SECONDS", "10"))
+
+# Pre-computed translations written by bulk translation and read before any network call
+TRANSLATIONS_FILE = Path(os.getenv("TRANSLATIONS_FILE", "outputs/translations.json"))
+
+# Process-wide rate limit for image generation requests (0 disables the limiter)
+GENERATION_RATE_LIMIT_RPM = float(os.getenv("GENERATION_RATE_LIMIT_RPM", "60"))
+GENERATION_RATE_BURST = int(os.getenv("GENERATION_RATE_BURST", str(MAX_CONCURRENT_GENERATIONS)))
+
+# Retry policy for rate-limited (429) and transient server errors
+GENERATION_MAX_RETRIES = int(os.getenv("GENERATION_MAX_RETRIES", "5"))
+GENERATION_RETRY_BASE_DELAY = 2.0
+GENERATION_RETRY_MAX_DELAY = 60.0
+
 # Product views to generate with detailed angle descriptions
 PRODUCT_VIEWS = {
     "front": "straight-on front view, camera directly facing the front of the product at eye level, showing the primary face/label",
@@ -47,32 +148,86 @@ REGION_COUNTRIES = {
     "oceania": ["AUS", "NZL", "FJI", "PNG", "NCL", "PYF", "GUM", "SLB"]
 }
 
+# Inverse index (country -> region) and the country order used by the map trace.
+# A country listed in several regions (AUS, NZL) is coloured as the last one.
+COUNTRY_TO_REGION = {
+    country: region_key
+    for region_key, countries in REGION_COUNTRIES.items()
+    for country in countries
+}
+MAP_COUNTRIES = list(COUNTRY_TO_REGION.keys())
+
+# Clicking a country listed in several regions selects the first one (AUS, NZL -> asia_pacific)
+# (built from the regions in reverse, so earlier regions overwrite later ones)
+CLICK_COUNTRY_TO_REGION = {
+    country: region_key
+    for region_key, countries in reversed(REGION_COUNTRIES.items())
+    for country in countries
+}
+
+# Base world map (rebuilt when regions.yaml changes) and highlighted figures per region
+_world_map_cache = {"regions": None, "base": None, "figures": {}}
+_world_map_lock = threading.Lock()
+
 
 def generate_campaign_id() -> str:
     """Generate a unique campaign ID based on timestamp."""
     return datetime.now().strftime("%Y%m%d_%H%M%S")
 
 
-def load_regions_config() -> dict:
-    """Load regions configuration from YAML file."""
-    config_path = CONFIG_DIR / "regions.yaml"
-    if not config_path.exists():
-        return {}
+# Parsed config files keyed by filename: (mtime_ns, frozen contents)
+_config_registry = {}
+_config_registry_lock = threading.Lock()
+
+
+def freeze_config(value: Any) -> Any:
+    """Recursively convert parsed YAML into read-only mappings and tuples."""
+    if isinstance(value, dict):
+        return MappingProxyType({key: freeze_config(item) for key, item in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze_config(item) for item in value)
+    return value
+
+
+def thaw_config(value: Any) -> Any:
+    """Recursively convert a frozen config object back to plain dicts and lists (e.g. for JSON)."""
+    if isinstance(value, Mapping):
+        return {key: thaw_config(item) for key, item in value.items()}
+    if isinstance(value, tuple):
+        return [thaw_config(item) for item in value]
+    return value
+
+
+def load_config_file(filename: str) -> Mapping:
+    """Load a YAML file from CONFIG_DIR, parsing it again only when its mtime changes.
+
+    Returns a shared read-only object; use thaw_config() for a mutable copy.
+    """
+    config_path = CONFIG_DIR / filename
+    try:
+        mtime = config_path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return MappingProxyType({})
+
+    with _config_registry_lock:
+        cached = _config_registry.get(filename)
+        if cached and cached[0] == mtime:
+            return cached[1]
+
+        with open(config_path, 'r') as f:
+            config = freeze_config(yaml.safe_load(f) or {})
+        _config_registry[filename] = (mtime, config)
+        return config
 
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
-        return config.get('regions', {})
 
+def load_regions_config() -> Mapping:
+    """Load regions configuration from YAML file (cached until the file changes)."""
+    return load_config_file("regions.yaml").get('regions', MappingProxyType({}))
 
-def load_audiences_config() -> dict:
-    """Load audiences configuration from YAML file."""
-    config_path = CONFIG_DIR / "audiences.yaml"
-    if not config_path.exists():
-        return {}
 
-    with open(config_path, 'r') as f:
-        config = yaml.safe_load(f)
-        return config.get('audiences', {})
+def load_audiences_config() -> Mapping:
+    """Load audiences configuration from YAML file (cached until the file changes)."""
+    return load_config_file("audiences.yaml").get('audiences', MappingProxyType({}))
 
 
 def get_region_choices() -> List[Tuple[str, str]]:
@@ -87,29 +242,14 @@ def get_audience_choices() -> List[Tuple[str, str]]:
     return [(info['name'], key) for key, info in audiences.items()]
 
 
-def create_world_map(selected_region: Optional[str] = None):
-    """Create an interactive world map with highlighted regions."""
-
-    # Create a mapping of all countries to their region
-    country_to_region = {}
-    for region_key, countries in REGION_COUNTRIES.items():
-        for country in countries:
-            country_to_region[country] = region_key
-
-    # Get all unique countries
-    all_countries = list(country_to_region.keys())
-
-    # Create data for the map
-    region_names = load_regions_config()
-
-    # Assign colors based on selection
+def get_world_map_patch(selected_region: Optional[str], regions: Mapping) -> dict:
+    """Compute the per-selection z and hover values for the world map trace."""
     colors = []
     hover_texts = []
 
-    for country in all_countries:
-        region_key = country_to_region[country]
-        region_info = region_names.get(region_key, {})
-        region_name = region_info.get('name', region_key)
+    for country in MAP_COUNTRIES:
+        region_key = COUNTRY_TO_REGION[country]
+        region_name = regions.get(region_key, {}).get('name', region_key)
 
         if selected_region == region_key:
             colors.append(1)  # Highlighted
@@ -118,10 +258,13 @@ def create_world_map(selected_region: Optional[str] = None):
             colors.append(0.3)  # Dimmed
             hover_texts.append(region_name)
 
-    # Create the choropleth map
+    return {"z": colors, "hovertext": hover_texts}
+
+
+def build_base_world_map() -> go.Figure:
+    """Build the static part of the world map (countries, colorscale, geo and layout)."""
     fig = go.Figure(data=go.Choropleth(
-        locations=all_countries,
-        z=colors,
+        locations=MAP_COUNTRIES,
         locationmode='ISO-3',
         colorscale=[
             [0, '#E8E8E8'],      # Unselected (light gray)
@@ -129,7 +272,6 @@ def create_world_map(selected_region: Optional[str] = None):
             [1, '#2E5C8A']       # Selected (dark blue)
         ],
         showscale=False,
-        hovertext=hover_texts,
         hoverinfo='text',
         marker=dict(
             line=dict(
@@ -159,12 +301,38 @@ def create_world_map(selected_region: Optional[str] = None):
         paper_bgcolor='#FAFAFA',
         geo=dict(
             bgcolor='#FAFAFA'
-        )
+        ),
+        # Minimal template instead of the full default one, which would otherwise
+        # make up most of the JSON sent to the browser on every map update
+        template=go.layout.Template(layout=dict(
+            font=dict(color='#2a3f5f'),
+            hoverlabel=dict(align='left')
+        ))
     )
 
     return fig
 
 
+def create_world_map(selected_region: Optional[str] = None):
+    """Create an interactive world map with highlighted regions.
+
+    The base figure is built once per regions.yaml version; each selection only
+    patches the trace's z and hover values, and patched figures are cached per region.
+    """
+    regions = load_regions_config()
+
+    with _world_map_lock:
+        if _world_map_cache["regions"] is not regions:
+            _world_map_cache.update(regions=regions, base=build_base_world_map(), figures={})
+
+        if selected_region not in _world_map_cache["figures"]:
+            fig = go.Figure(_world_map_cache["base"])
+            fig.update_traces(**get_world_map_patch(selected_region, regions))
+            _world_map_cache["figures"][selected_region] = fig
+
+        return _world_map_cache["figures"][selected_region]
+
+
 def get_region_from_click(click_data):
     """Extract region key from map click data."""
     if not click_data or not click_data.get('points'):
@@ -178,53 +346,142 @@ def get_region_from_click(click_data):
         return None
 
     # Find which region this country belongs to
-    for region_key, countries in REGION_COUNTRIES.items():
-        if country_code in countries:
-            return region_key
+    return CLICK_COUNTRY_TO_REGION.get(country_code)
 
-    return None
 
+# Supported product image formats and files to ignore in photo folders
+PRODUCT_IMAGE_EXTENSIONS = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.avif', '.svg', '.bmp'}
+PRODUCT_IGNORE_FILES = {'.gitkeep', '.ds_store'}
 
-def get_available_products() -> List[str]:
-    """Get list of all available products from the products directory."""
-    if not PRODUCTS_DIR.exists():
-        return []
+# In-memory index of products/: slug -> {"signature", "config", "images": {type: (info, ...)}}.
+# A product is re-indexed only when its folder, photo folders or config.yaml change mtime.
+_product_catalog = {"root_mtime": None, "slugs": (), "products": {}}
+_product_catalog_lock = threading.Lock()
 
-    products = []
-    for item in PRODUCTS_DIR.iterdir():
-        if item.is_dir() and not item.name.startswith('.'):
-            products.append(item.name)
 
-    return sorted(products)
+def get_mtime(path: Path) -> Optional[int]:
+    """Get a path's mtime in nanoseconds, or None if it does not exist."""
+    try:
+        return path.stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
 
 
-def get_product_images(product_slug: str, image_type: str) -> List[str]:
-    """Get all images for a product of a specific type (product or logo)."""
-    if not product_slug:
-        return []
+def get_product_signature(product_slug: str) -> tuple:
+    """Get the mtimes that decide whether a product's catalog entry is stale."""
+    product_dir = PRODUCTS_DIR / product_slug
+    return (
+        get_mtime(product_dir),
+        get_mtime(product_dir / "config.yaml"),
+        get_mtime(product_dir / "photos" / "product"),
+        get_mtime(product_dir / "photos" / "logo")
+    )
 
-    image_dir = PRODUCTS_DIR / product_slug / "photos" / image_type
 
+def scan_product_images(image_dir: Path) -> tuple:
+    """List the images in a photo folder with their size and dimensions."""
     if not image_dir.exists():
-        return []
-
-    # Supported image formats
-    image_extensions = {'.jpg', '.jpeg', '.png', '.webp', '.gif', '.avif', '.svg', '.bmp'}
-
-    # Files to ignore
-    ignore_files = {'.gitkeep', '.ds_store'}
+        return ()
 
     images = []
     for file in image_dir.iterdir():
-        # Skip if it's a directory or should be ignored
-        if not file.is_file() or file.name.lower() in ignore_files:
+        # Skip directories, ignored files and unsupported formats
+        if not file.is_file() or file.name.lower() in PRODUCT_IGNORE_FILES:
+            continue
+        if file.suffix.lower() not in PRODUCT_IMAGE_EXTENSIONS:
             continue
 
-        # Check if it has a supported image extension
-        if file.suffix.lower() in image_extensions:
-            images.append(str(file))
+        # Only the header is read to get dimensions (e.g. SVG cannot be opened)
+        width = height = None
+        try:
+            with Image.open(file) as img:
+                width, height = img.size
+        except Exception:
+            pass
+
+        images.append(MappingProxyType({
+            "path": str(file),
+            "size": file.stat().st_size,
+            "width": width,
+            "height": height
+        }))
+
+    return tuple(sorted(images, key=lambda info: info["path"]))
+
+
+def index_product(product_slug: str, signature: tuple) -> dict:
+    """Build the catalog entry for one product."""
+    product_dir = PRODUCTS_DIR / product_slug
+
+    config = None
+    config_path = product_dir / "config.yaml"
+    if config_path.exists():
+        with open(config_path, 'r') as f:
+            config = freeze_config(yaml.safe_load(f))
+
+    return {
+        "signature": signature,
+        "config": config,
+        "images": {
+            image_type: scan_product_images(product_dir / "photos" / image_type)
+            for image_type in ("product", "logo")
+        }
+    }
+
+
+def refresh_product_catalog(full: bool = False):
+    """Update the product slug list if products/ changed; with full=True, re-check every product."""
+    with _product_catalog_lock:
+        root_mtime = get_mtime(PRODUCTS_DIR)
+        if root_mtime != _product_catalog["root_mtime"]:
+            slugs = []
+            if root_mtime is not None:
+                slugs = [item.name for item in PRODUCTS_DIR.iterdir() if item.is_dir() and not item.name.startswith('.')]
+            _product_catalog["root_mtime"] = root_mtime
+            _product_catalog["slugs"] = tuple(sorted(slugs))
+            _product_catalog["products"] = {
+                slug: entry for slug, entry in _product_catalog["products"].items() if slug in slugs
+            }
+
+    if full:
+        for slug in _product_catalog["slugs"]:
+            get_product_entry(slug)
+
+
+def get_product_entry(product_slug: str) -> Optional[dict]:
+    """Get a product's catalog entry, re-indexing it only if its mtimes changed."""
+    if not product_slug:
+        return None
+
+    signature = get_product_signature(product_slug)
+    if signature[0] is None:
+        return None
+
+    with _product_catalog_lock:
+        entry = _product_catalog["products"].get(product_slug)
+        if entry is None or entry["signature"] != signature:
+            entry = index_product(product_slug, signature)
+            _product_catalog["products"][product_slug] = entry
+        return entry
+
+
+def get_product_image_info(product_slug: str, image_type: str) -> tuple:
+    """Get path, size and dimensions of a product's images of a specific type (product or logo)."""
+    entry = get_product_entry(product_slug)
+    if not entry:
+        return ()
+    return entry["images"].get(image_type, ())
+
+
+def get_available_products() -> List[str]:
+    """Get list of all available products from the products directory."""
+    refresh_product_catalog()
+    return list(_product_catalog["slugs"])
+
 
-    return sorted(images)
+def get_product_images(product_slug: str, image_type: str) -> List[str]:
+    """Get all images for a product of a specific type (product or logo)."""
+    return [info["path"] for info in get_product_image_info(product_slug, image_type)]
 
 
 def load_product(product_slugs) -> Tuple[List[str], List[str]]:
@@ -263,6 +520,9 @@ def save_api_key(api_key: str) -> str:
     # Set in current environment
     os.environ["GOOGLE_API_KEY"] = api_key.strip()
 
+    # Drop pooled clients for the previous key; the next generation builds a new one
+    reset_genai_clients(keep_api_key=api_key.strip())
+
     return "✅ API key saved successfully!"
 
 
@@ -275,212 +535,2487 @@ def get_api_key_status() -> str:
     return "⚠️ API Key not configured"
 
 
-def load_product_config(product_slug: str) -> Optional[dict]:
-    """Load product configuration from YAML file."""
-    config_path = PRODUCTS_DIR / product_slug / "config.yaml"
-    if not config_path.exists():
-        return None
+def load_product_config(product_slug: str) -> Optional[Mapping]:
+    """Load product configuration from the product catalog (re-read when config.yaml changes)."""
+    entry = get_product_entry(product_slug)
+    return entry["config"] if entry else None
 
-    with open(config_path, 'r') as f:
-        return yaml.safe_load(f)
 
+# ============================================================================
+# Gemini Client Registry
+# ============================================================================
 
-def generate_product_views(product_slugs, generation_mode: str, campaign_id: str, progress=gr.Progress()) -> Tuple[str, List[str]]:
-    """Generate all product views using Gemini 2.5 Flash Image with existing product photos as reference."""
+_client_registry_lock = threading.Lock()
+_client_registry = {}
+_client_stats = {"created": 0, "reused": 0, "closed": 0}
 
-    # Handle both single string and list
-    if isinstance(product_slugs, str):
-        product_slugs = [product_slugs]
 
-    # Check products selected
-    if not product_slugs:
-        return "❌ Error: Please select at least one product first", []
+def get_genai_client(api_key: str):
+    """Get the long-lived Gemini client for an API key, creating it on first use.
 
-    # Check API key
-    api_key = os.getenv("GOOGLE_API_KEY")
-    if not api_key or api_key == "your_api_key_here":
-        return "❌ Error: Please configure your API key in Settings tab first", []
+    Reusing one client keeps its HTTP connection pool (and TLS sessions) warm
+    across generations, handler invocations and user sessions.
+    """
+    with _client_registry_lock:
+        client = _client_registry.get(api_key)
+        if client is not None:
+            _client_stats["reused"] += 1
+            return client
 
-    # Create campaign directory structure (use campaign_id only, no timestamp)
-    campaign_dir = Path("outputs") / campaign_id
+        client = genai.Client(api_key=api_key)
+        _client_registry[api_key] = client
+        _client_stats["created"] += 1
+        return client
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    generated_images = []
 
+def reset_genai_clients(keep_api_key: Optional[str] = None):
+    """Close and drop pooled clients, except the one for keep_api_key."""
+    with _client_registry_lock:
+        stale_keys = [key for key in _client_registry if key != keep_api_key]
+        for key in stale_keys:
+            client = _client_registry.pop(key)
+            try:
+                client.close()
+            except Exception as e:
+                print(f"Warning: Could not close Gemini client: {e}")
+            _client_stats["closed"] += 1
+
+
+def get_client_stats() -> dict:
+    """Get client creation and reuse counters."""
+    with _client_registry_lock:
+        stats = dict(_client_stats)
+        stats["active"] = len(_client_registry)
+        return stats
+
+
+# ============================================================================
+# Generation Cache
+# ============================================================================
+
+_generation_cache_lock = threading.Lock()
+_generation_cache_stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+
+def generation_cache_key(contents, aspect_ratio: str) -> str:
+    """Hash a full generation request (model, image config, prompt text and reference image data)."""
+    hasher = hashlib.sha256()
+    hasher.update(f"model={IMAGE_MODEL}\naspect_ratio={aspect_ratio}\n".encode("utf-8"))
+
+    items = contents if isinstance(contents, list) else [contents]
+    for item in items:
+        if isinstance(item, str):
+            hasher.update(b"text\n")
+            hasher.update(item.encode("utf-8"))
+        elif isinstance(item, types.Part) and item.inline_data:
+            hasher.update(f"part {item.inline_data.mime_type}\n".encode("utf-8"))
+            hasher.update(item.inline_data.data)
+        elif isinstance(item, Image.Image):
+            hasher.update(f"image {item.mode} {item.size[0]}x{item.size[1]}\n".encode("utf-8"))
+            hasher.update(item.tobytes())
+        else:
+            hasher.update(b"other\n")
+            hasher.update(repr(item).encode("utf-8"))
+        hasher.update(b"\n--\n")
+
+    return hasher.hexdigest()
+
+
+def get_cached_generation(key: str) -> Optional[bytes]:
+    """Return cached image bytes for a request key, or None on a miss."""
+    cache_file = GENERATION_CACHE_DIR / f"{key}.bin"
+
+    with _generation_cache_lock:
+        try:
+            data = cache_file.read_bytes()
+        except OSError:
+            _generation_cache_stats["misses"] += 1
+            return None
+
+        # Touch the entry so eviction treats it as recently used
+        try:
+            os.utime(cache_file)
+        except OSError:
+            pass
+
+        _generation_cache_stats["hits"] += 1
+        return data
+
+
+def store_cached_generation(key: str, data: bytes):
+    """Store generated image bytes and evict least recently used entries over the size limit."""
+    with _generation_cache_lock:
+        GENERATION_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        cache_file = GENERATION_CACHE_DIR / f"{key}.bin"
+        tmp_file = cache_file.with_suffix(".tmp")
+        tmp_file.write_bytes(data)
+        tmp_file.replace(cache_file)
+
+        entries = []
+        for entry in GENERATION_CACHE_DIR.glob("*.bin"):
+            try:
+                stat = entry.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, entry))
+
+        total_size = sum(size for _, size, _ in entries)
+        max_size = GENERATION_CACHE_MAX_MB * 1024 * 1024
+
+        for _, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total_size <= max_size:
+                break
+            if entry == cache_file:
+                continue
+            try:
+                entry.unlink()
+                total_size -= size
+                _generation_cache_stats["evictions"] += 1
+            except OSError:
+                pass
+
+
+def get_generation_cache_stats() -> dict:
+    """Get generation cache counters and current disk usage."""
+    with _generation_cache_lock:
+        stats = dict(_generation_cache_stats)
+        entries = list(GENERATION_CACHE_DIR.glob("*.bin")) if GENERATION_CACHE_DIR.exists() else []
+        stats["entries"] = len(entries)
+        stats["size_bytes"] = sum(entry.stat().st_size for entry in entries)
+        return stats
+
+
+def clear_generation_cache() -> str:
+    """Delete all cached generations."""
+    with _generation_cache_lock:
+        removed = 0
+        if GENERATION_CACHE_DIR.exists():
+            for entry in GENERATION_CACHE_DIR.glob("*.bin"):
+                entry.unlink()
+                removed += 1
+    return f"✅ Cleared {removed} cached generation(s)"
+
+
+def format_generation_stats() -> str:
+    """Format cache, thumbnail, encoding, rate limiter, client and translation statistics as markdown for the Settings tab."""
+    stats = get_generation_cache_stats()
+    lookups = stats["hits"] + stats["misses"]
+    hit_rate = f"{stats['hits'] / lookups:.0%}" if lookups else "n/a"
+    size_mb = stats["size_bytes"] / (1024 * 1024)
+
+    reference_stats = get_reference_cache_stats()
+    reference_mb = reference_stats["size_bytes"] / (1024 * 1024)
+    limiter_stats = get_rate_limiter_stats()
+    client_stats = get_client_stats()
+    translation_stats = get_translation_cache_stats()
+    thumbnail_stats = get_thumbnail_cache_stats()
+    image_pool_stats = get_image_pool_stats()
+    thumbnail_mb = thumbnail_stats["size_bytes"] / (1024 * 1024)
+    client_calls = client_stats["created"] + client_stats["reused"]
+    reuse_rate = f"{client_stats['reused'] / client_calls:.0%}" if client_calls else "n/a"
+
+    return (
+        f"**Generation cache:** {stats['entries']} image(s), {size_mb:.1f} MB of {GENERATION_CACHE_MAX_MB} MB\n\n"
+        f"- Hits: {stats['hits']}\n"
+        f"- Misses: {stats['misses']}\n"
+        f"- Hit rate: {hit_rate}\n"
+        f"- Evictions: {stats['evictions']}\n\n"
+        f"**Reference photos:** {reference_stats['entries']} prepared, {reference_mb:.1f} MB (max edge {REFERENCE_MAX_EDGE}px)\n\n"
+        f"**Gallery thumbnails:** {thumbnail_stats['entries']} cached, {thumbnail_mb:.1f} MB (max edge {THUMBNAIL_MAX_EDGE}px)\n\n"
+        f"**Image encoding:** {image_pool_stats['passthrough']} written as-is, "
+        f"{image_pool_stats['offloaded']} in {IMAGE_WORKERS} worker process(es), "
+        f"{image_pool_stats['inline']} inline, {image_pool_stats['queue_wait_seconds']:.1f}s queued\n\n"
+        f"**API requests:** {limiter_stats['requests']} sent, {limiter_stats['retries']} retried, "
+        f"{limiter_stats['throttled_seconds']:.0f}s throttled (limit {GENERATION_RATE_LIMIT_RPM:g}/min), "
+        f"{limiter_stats['uploaded_bytes'] / (1024 * 1024):.1f} MB uploaded\n\n"
+        f"**API clients:** {client_stats['active']} active, {client_stats['created']} created, "
+        f"{client_stats['reused']} reused ({reuse_rate} client reuse)\n\n"
+        f"**Translations:** {translation_stats['entries']} cached, {translation_stats['hits']} hits, "
+        f"{translation_stats['misses']} misses, {translation_stats['negative_hits']} cached failures"
+    )
+
+
+# ============================================================================
+# Reference Image Preprocessing
+# ============================================================================
+
+_reference_cache_lock = threading.Lock()
+# Prepared JPEG bytes of recently used references, least recently used first (bounded by REFERENCE_MEMORY_CACHE_MB)
+_reference_memory_cache = OrderedDict()
+_reference_memory_bytes = 0
+
+
+def reference_cache_key(photo_path: str) -> str:
+    """Key a reference photo by path, modification time, size and preprocessing settings."""
+    path = Path(photo_path).resolve()
+    stat = path.stat()
+    raw_key = f"{path}|{stat.st_mtime_ns}|{stat.st_size}|{REFERENCE_MAX_EDGE}|{REFERENCE_JPEG_QUALITY}"
+    return hashlib.sha256(raw_key.encode("utf-8")).hexdigest()
+
+
+def normalize_reference_image(photo_path: str) -> bytes:
+    """Decode a photo, flatten it to RGB on white, downscale it and encode it as JPEG."""
+    with Image.open(photo_path) as img:
+        img.load()
+
+        # Flatten transparency onto white, matching the product view backgrounds
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            background = Image.new("RGB", img.size, (255, 255, 255))
+            background.paste(img, mask=img.getchannel("A"))
+            img = background
+        elif img.mode != "RGB":
+            img = img.convert("RGB")
+
+        if max(img.size) > REFERENCE_MAX_EDGE:
+            img.thumbnail((REFERENCE_MAX_EDGE, REFERENCE_MAX_EDGE), Image.LANCZOS)
+
+        buffer = BytesIO()
+        img.save(buffer, "JPEG", quality=REFERENCE_JPEG_QUALITY, optimize=True)
+        return buffer.getvalue()
+
+
+def prepare_reference_image(photo_path: str) -> types.Part:
+    """Get a normalized reference photo as a request part, decoding the source only once.
+
+    Prepared JPEG bytes are kept in REFERENCE_CACHE_DIR (and the most recently used
+    ones in memory, up to REFERENCE_MEMORY_CACHE_MB), so later runs (and restarts)
+    skip decoding and resizing unchanged photos.
+    """
+    global _reference_memory_bytes
+    key = reference_cache_key(photo_path)
+
+    with _reference_cache_lock:
+        data = _reference_memory_cache.get(key)
+        if data is not None:
+            _reference_memory_cache.move_to_end(key)
+
+    if data is None:
+        cache_file = REFERENCE_CACHE_DIR / f"{key}.jpg"
+        if cache_file.exists():
+            data = cache_file.read_bytes()
+        else:
+            data = normalize_reference_image(photo_path)
+            REFERENCE_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_file = cache_file.with_suffix(".tmp")
+            tmp_file.write_bytes(data)
+            tmp_file.replace(cache_file)
+
+        with _reference_cache_lock:
+            if key not in _reference_memory_cache:
+                _reference_memory_cache[key] = data
+                _reference_memory_bytes += len(data)
+            while _reference_memory_bytes > REFERENCE_MEMORY_CACHE_MB * 1024 * 1024 and len(_reference_memory_cache) > 1:
+                _, evicted = _reference_memory_cache.popitem(last=False)
+                _reference_memory_bytes -= len(evicted)
+
+    return types.Part.from_bytes(data=data, mime_type="image/jpeg")
+
+
+def get_reference_cache_stats() -> dict:
+    """Get the number and total size of prepared reference images on disk."""
+    entries = list(REFERENCE_CACHE_DIR.glob("*.jpg")) if REFERENCE_CACHE_DIR.exists() else []
+    return {
+        "entries": len(entries),
+        "size_bytes": sum(entry.stat().st_size for entry in entries)
+    }
+
+
+# ============================================================================
+# Thumbnails
+# ============================================================================
+
+_thumbnail_lock = threading.Lock()
+_thumbnail_hashes = {}   # (path, mtime_ns, size) -> source content hash
+_thumbnail_sources = {}  # thumbnail file stem -> original image path
+
+
+def get_source_hash(path: str) -> str:
+    """Hash an image's content, memoized by path, modification time and size."""
+    stat = os.stat(path)
+    key = (str(path), stat.st_mtime_ns, stat.st_size)
+    with _thumbnail_lock:
+        if key in _thumbnail_hashes:
+            return _thumbnail_hashes[key]
+
+    with open(path, 'rb') as f:
+        source_hash = hashlib.sha256(f.read()).hexdigest()[:40]
+
+    with _thumbnail_lock:
+        _thumbnail_hashes[key] = source_hash
+    return source_hash
+
+
+def get_thumbnail(path: str) -> str:
+    """Get a small cached WebP preview of an image for display in galleries.
+
+    Thumbnails are keyed by the source content hash and remember their original
+    path (see resolve_thumbnail). Falls back to the original if it cannot be decoded.
+    """
     try:
-        # Initialize Gemini client
-        client = genai.Client(api_key=api_key)
+        stem = f"{get_source_hash(path)}_{THUMBNAIL_MAX_EDGE}"
+        thumb_path = THUMBNAIL_DIR / f"{stem}.webp"
+
+        if not thumb_path.exists():
+            with Image.open(path) as img:
+                img.thumbnail((THUMBNAIL_MAX_EDGE, THUMBNAIL_MAX_EDGE), Image.LANCZOS)
+                if img.mode not in ("RGB", "RGBA"):
+                    img = img.convert("RGBA" if "A" in img.getbands() or "transparency" in img.info else "RGB")
+
+                THUMBNAIL_DIR.mkdir(parents=True, exist_ok=True)
+                tmp_path = thumb_path.with_suffix(f".{threading.get_ident()}.tmp")
+                img.save(tmp_path, format="WEBP", quality=THUMBNAIL_QUALITY, method=4)
+                os.replace(tmp_path, thumb_path)
+
+        with _thumbnail_lock:
+            _thumbnail_sources[stem] = str(path)
+        return str(thumb_path)
+    except Exception as e:
+        print(f"Warning: Could not create thumbnail for {path}: {e}")
+        return str(path)
 
-        if generation_mode == "separate":
-            # Generate separate views for each product
-            for product_idx, product_slug in enumerate(product_slugs):
-                progress((product_idx) / len(product_slugs), desc=f"Processing {product_slug}...")
 
-                # Load product config
-                config = load_product_config(product_slug)
-                if not config:
-                    continue
+def to_thumbnails(paths: Optional[List[str]]) -> List[str]:
+    """Map a list of image paths to their gallery thumbnails."""
+    return [get_thumbnail(path) for path in paths or []]
 
-                product_info = config.get('product', {})
-                product_name = product_info.get('name', product_slug)
-                description = product_info.get('description', '')
 
-                # Load existing product photos
-                existing_photo_paths = get_product_images(product_slug, "product")
-                if not existing_photo_paths:
-                    continue
+def resolve_thumbnail(path: str) -> str:
+    """Map a gallery thumbnail (or Gradio's cached copy of one) back to its original image."""
+    with _thumbnail_lock:
+        return _thumbnail_sources.get(Path(path).stem, path)
 
-                # Load as PIL Images
-                reference_images = []
-                for photo_path in existing_photo_paths:
-                    try:
-                        img = Image.open(photo_path)
-                        reference_images.append(img)
-                    except Exception as e:
-                        print(f"Warning: Could not load {photo_path}: {e}")
 
-                if not reference_images:
-                    continue
+def with_thumbnails(handler: Callable, *gallery_positions: int) -> Callable:
+    """Wrap a streaming handler so the gallery outputs at the given positions show thumbnails."""
+    @wraps(handler)
+    def wrapper(*args, **kwargs):
+        for update in handler(*args, **kwargs):
+            yield tuple(
+                to_thumbnails(value) if position in gallery_positions else value
+                for position, value in enumerate(update)
+            )
+    return wrapper
 
-                # Create product directory in campaign folder
-                generated_dir = campaign_dir / "products" / product_slug
-                generated_dir.mkdir(parents=True, exist_ok=True)
 
-                # Generate each view
-                for idx, (view_name, view_description) in enumerate(PRODUCT_VIEWS.items()):
-                    total_progress = (product_idx * len(PRODUCT_VIEWS) + idx + 1) / (len(product_slugs) * len(PRODUCT_VIEWS))
-                    progress(total_progress, desc=f"{product_slug}: {view_name} view...")
+def get_thumbnail_cache_stats() -> dict:
+    """Get the number and total size of cached thumbnails on disk."""
+    entries = list(THUMBNAIL_DIR.glob("*.webp")) if THUMBNAIL_DIR.exists() else []
+    return {
+        "entries": len(entries),
+        "size_bytes": sum(entry.stat().st_size for entry in entries)
+    }
 
-                    prompt = f"""Study the provided reference images of this {product_name} product.
 
-Generate a professional product photography shot with this EXACT camera angle: {view_description}.
+# ============================================================================
+# Rate Limiting & Retries
+# ============================================================================
 
-Product details: {description}
+# Status codes worth retrying: rate limiting and transient server errors
+RETRYABLE_STATUS_CODES = {408, 429, 500, 502, 503, 504}
 
-CRITICAL REQUIREMENTS:
-- The product MUST look identical to the reference images (same shape, size, colors, labels, text, branding)
-- Pure white background (#FFFFFF)
-- Professional studio lighting with soft shadows
-- Camera angle: {view_description}
-- High resolution, sharp focus
-- Photorealistic rendering
-- Square aspect ratio (1:1)
+_rate_limiter_lock = threading.Lock()
+_rate_limiter_state = {
+    "tokens": float(max(1, GENERATION_RATE_BURST)),
+    "updated": time.monotonic(),
+    "blocked_until": 0.0
+}
+_rate_limiter_stats = {"requests": 0, "retries": 0, "throttled_seconds": 0.0, "uploaded_bytes": 0}
 
-Output only the product photograph from the specified angle. Do not include any text, labels, or annotations."""
 
-                    contents = [prompt] + reference_images
-                    response = client.models.generate_content(
-                        model="gemini-2.5-flash-image",
-                        contents=contents,
-                        config=types.GenerateContentConfig(
-                            response_modalities=["IMAGE"],
-                            image_config=types.ImageConfig(
-                                aspect_ratio="1:1",
-                            )
-                        )
-                    )
+def acquire_generation_slot():
+    """Block until the process-wide token bucket allows another generation request."""
+    while True:
+        with _rate_limiter_lock:
+            now = time.monotonic()
+            wait_seconds = _rate_limiter_state["blocked_until"] - now
 
-                    image_parts = [
-                        part.inline_data.data
-                        for part in response.candidates[0].content.parts
-                        if part.inline_data
-                    ]
+            if wait_seconds <= 0:
+                if GENERATION_RATE_LIMIT_RPM <= 0:
+                    _rate_limiter_stats["requests"] += 1
+                    return
 
-                    if image_parts:
-                        image = Image.open(BytesIO(image_parts[0]))
-                        filename = f"{view_name}_{timestamp}.png"
-                        filepath = generated_dir / filename
-                        image.save(filepath, "PNG")
-                        generated_images.append(str(filepath))
+                # Refill tokens for the time elapsed since the last request
+                rate = GENERATION_RATE_LIMIT_RPM / 60.0
+                elapsed = now - _rate_limiter_state["updated"]
+                _rate_limiter_state["tokens"] = min(float(max(1, GENERATION_RATE_BURST)), _rate_limiter_state["tokens"] + elapsed * rate)
+                _rate_limiter_state["updated"] = now
 
-            return f"✅ Successfully generated {len(generated_images)} separate product views for {len(product_slugs)} product(s)!\n\n**Campaign Folder:** `{campaign_dir}/`\n\nProducts saved to: `{campaign_dir / 'products'}/`", generated_images
+                if _rate_limiter_state["tokens"] >= 1:
+                    _rate_limiter_state["tokens"] -= 1
+                    _rate_limiter_stats["requests"] += 1
+                    return
 
-        else:  # combined mode
-            # Load all product configs and images
-            all_product_names = []
-            all_descriptions = []
-            all_reference_images = []
+                wait_seconds = (1 - _rate_limiter_state["tokens"]) / rate
 
-            for product_slug in product_slugs:
-                config = load_product_config(product_slug)
-                if not config:
-                    continue
+            _rate_limiter_stats["throttled_seconds"] += wait_seconds
 
-                product_info = config.get('product', {})
-                all_product_names.append(product_info.get('name', product_slug))
-                all_descriptions.append(product_info.get('description', ''))
+        time.sleep(wait_seconds)
 
-                # Load product photos
-                existing_photo_paths = get_product_images(product_slug, "product")
-                for photo_path in existing_photo_paths:
-                    try:
-                        img = Image.open(photo_path)
-                        all_reference_images.append(img)
-                    except Exception as e:
-                        print(f"Warning: Could not load {photo_path}: {e}")
 
-            if not all_reference_images:
-                return "❌ Error: Could not load any product photos", []
+def pause_generation_requests(seconds: float):
+    """Hold back every generation request for the given time (used for server retry-after hints)."""
+    with _rate_limiter_lock:
+        _rate_limiter_state["blocked_until"] = max(_rate_limiter_state["blocked_until"], time.monotonic() + seconds)
 
-            # Create output directory for combined images in campaign folder
-            combined_dir = campaign_dir / "products" / "combined"
-            combined_dir.mkdir(parents=True, exist_ok=True)
 
-            # Generate combined views
-            products_str = " and ".join(all_product_names)
-            descriptions_str = ". ".join(all_descriptions)
+def get_retry_after(error: Exception) -> Optional[float]:
+    """Extract a server-provided retry delay (Retry-After header or RetryInfo detail) in seconds."""
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if headers:
+        retry_after = headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+
+    details = getattr(error, "details", None)
+    if isinstance(details, dict):
+        for detail in details.get("error", {}).get("details", []) or []:
+            retry_delay = detail.get("retryDelay") if isinstance(detail, dict) else None
+            if retry_delay:
+                try:
+                    return float(str(retry_delay).rstrip("s"))
+                except ValueError:
+                    pass
 
-            for idx, (view_name, view_description) in enumerate(PRODUCT_VIEWS.items()):
-                progress((idx + 1) / len(PRODUCT_VIEWS), desc=f"Generating combined {view_name} view...")
+    return None
 
-                prompt = f"""Study the provided reference images showing multiple products: {products_str}.
 
-Generate a professional product photography shot showing ALL products together in a single composition with this EXACT camera angle: {view_description}.
+def is_retryable_error(error: Exception) -> bool:
+    """Check whether a failed generation call is worth retrying."""
+    if isinstance(error, genai_errors.APIError):
+        return error.code in RETRYABLE_STATUS_CODES
+    return isinstance(error, (httpx.TransportError, TimeoutError, ConnectionError))
 
-Products: {descriptions_str}
 
-CRITICAL REQUIREMENTS:
-- Show ALL products together in the same image
-- Each product MUST look identical to its reference images (same shape, size, colors, labels, text, branding)
-- Arrange products in an aesthetically pleasing composition
-- Pure white background (#FFFFFF)
-- Professional studio lighting with soft shadows
-- Camera angle: {view_description}
-- High resolution, sharp focus
-- Photorealistic rendering
-- Square aspect ratio (1:1)
+def call_with_retry(request: Callable[[], Any]) -> Any:
+    """Run an API request under the shared rate limiter, retrying transient failures.
+
+    Retries use jittered exponential backoff and honor retry-after hints from
+    the server, which also pause every other in-flight generation.
+    """
+    for attempt in range(GENERATION_MAX_RETRIES + 1):
+        acquire_generation_slot()
+        try:
+            return request()
+        except Exception as e:
+            if attempt >= GENERATION_MAX_RETRIES or not is_retryable_error(e):
+                raise
+
+            backoff = min(GENERATION_RETRY_MAX_DELAY, GENERATION_RETRY_BASE_DELAY * (2 ** attempt))
+            delay = random.uniform(backoff / 2, backoff)
+
+            retry_after = get_retry_after(e)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+                pause_generation_requests(retry_after)
+
+            with _rate_limiter_lock:
+                _rate_limiter_stats["retries"] += 1
+
+            print(f"Warning: Generation request failed ({e}); retrying in {delay:.1f}s (attempt {attempt + 2}/{GENERATION_MAX_RETRIES + 1})")
+            time.sleep(delay)
+
+
+def get_request_size(contents) -> int:
+    """Measure a request's payload: prompt text plus inline image bytes (sent base64-encoded)."""
+    size = 0
+    items = contents if isinstance(contents, list) else [contents]
+    for item in items:
+        if isinstance(item, str):
+            size += len(item.encode("utf-8"))
+        elif isinstance(item, types.Part) and item.inline_data:
+            size += len(item.inline_data.data)
+    return size
+
+
+def new_upload_meter() -> dict:
+    """Create a per-run counter of requests sent and payload bytes uploaded."""
+    return {"requests": 0, "bytes": 0}
+
+
+def record_upload(size: int, meter: Optional[dict] = None):
+    """Count one sent request's payload in the process-wide and (optional) per-run totals."""
+    with _rate_limiter_lock:
+        _rate_limiter_stats["uploaded_bytes"] += size
+        if meter is not None:
+            meter["requests"] += 1
+            meter["bytes"] += size
+
+
+def get_rate_limiter_stats() -> dict:
+    """Get request, retry and throttling counters for the shared rate limiter."""
+    with _rate_limiter_lock:
+        return dict(_rate_limiter_stats)
+
+
+# ============================================================================
+# Job Queue
+# ============================================================================
+
+# A run is leased by the handler executing it; a lease whose heartbeat is older than
+# this (or whose process has exited) belongs to an interrupted run that may be adopted
+JOB_LEASE_SECONDS = 60
+
+_job_db_lock = threading.Lock()
+_job_leases = {}
+_job_heartbeat_thread = None
+
+
+def get_job_db() -> sqlite3.Connection:
+    """Open the job queue database, creating the schema on first use."""
+    JOB_DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(JOB_DB_PATH, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.executescript("""
+        CREATE TABLE IF NOT EXISTS runs (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            campaign_id TEXT NOT NULL,
+            kind TEXT NOT NULL,
+            params TEXT NOT NULL,
+            params_hash TEXT NOT NULL,
+            timestamp TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            owner TEXT,
+            heartbeat REAL
+        );
+        CREATE TABLE IF NOT EXISTS tasks (
+            run_id INTEGER NOT NULL REFERENCES runs(id),
+            task_key TEXT NOT NULL,
+            state TEXT NOT NULL,
+            output_path TEXT NOT NULL,
+            error TEXT,
+            updated_at TEXT NOT NULL,
+            PRIMARY KEY (run_id, task_key)
+        );
+        CREATE INDEX IF NOT EXISTS idx_runs_campaign ON runs(campaign_id, kind, params_hash);
+    """)
+
+    # Databases created before run leases existed lack the lease columns
+    if "owner" not in {row["name"] for row in conn.execute("PRAGMA table_info(runs)")}:
+        try:
+            conn.execute("ALTER TABLE runs ADD COLUMN owner TEXT")
+            conn.execute("ALTER TABLE runs ADD COLUMN heartbeat REAL")
+        except sqlite3.OperationalError:
+            pass  # Added concurrently by another process
+    return conn
+
+
+def new_job_owner() -> str:
+    """Create a lease owner token identifying this host, process and run."""
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+def is_job_owner_alive(owner: Optional[str], heartbeat: Optional[float]) -> bool:
+    """Check whether a run's lease is held by a handler that is still executing it."""
+    if not owner or heartbeat is None or time.time() - heartbeat > JOB_LEASE_SECONDS:
+        return False
+
+    # Owners on this host are checked directly, so runs of a crashed server are adopted right after a restart
+    host, pid, _ = owner.rsplit(":", 2)
+    if host == socket.gethostname() and os.name == "posix":
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except (OSError, ValueError):
+            pass
+    return True
+
+
+def keep_job_leases_alive():
+    """Refresh the heartbeat of every run this process is executing (runs in a daemon thread)."""
+    while True:
+        time.sleep(JOB_LEASE_SECONDS / 4)
+        with _job_db_lock:
+            if not _job_leases:
+                continue
+            now = time.time()
+            with closing(get_job_db()) as conn, conn:
+                conn.executemany(
+                    "UPDATE runs SET heartbeat = ? WHERE id = ? AND owner = ?",
+                    [(now, run_id, owner) for run_id, owner in _job_leases.items()]
+                )
+
+
+def release_job_run(run_id: Optional[int]):
+    """Release this process's lease on a run once its handler stops executing it."""
+    with _job_db_lock:
+        owner = _job_leases.pop(run_id, None)
+        if owner is None:
+            return
+        with closing(get_job_db()) as conn, conn:
+            conn.execute("UPDATE runs SET owner = NULL, heartbeat = NULL WHERE id = ? AND owner = ?", (run_id, owner))
+
+
+def start_job_run(campaign_id: str, kind: str, params: dict, force_regenerate: bool = False) -> Tuple[int, str]:
+    """Start a generation run, or pick up an unfinished run with identical parameters.
+
+    The run is leased to the caller until release_job_run. An unfinished run is
+    only adopted once its previous owner is gone; if another handler (a second
+    session, a double click or the startup resume) is still executing it,
+    RuntimeError is raised instead of generating the same tasks twice.
+
+    Returns:
+        Tuple of (run_id, timestamp). Reusing the interrupted run's timestamp
+        keeps output paths identical, so files already written are recognized.
+    """
+    global _job_heartbeat_thread
+    params_json = json.dumps(params, sort_keys=True, ensure_ascii=False)
+    params_hash = hashlib.sha256(params_json.encode("utf-8")).hexdigest()
+    owner = new_job_owner()
+
+    with _job_db_lock, closing(get_job_db()) as conn, conn:
+        row = None
+        if not force_regenerate:
+            row = conn.execute("""
+                SELECT r.id, r.timestamp, r.owner, r.heartbeat FROM runs r
+                WHERE r.campaign_id = ? AND r.kind = ? AND r.params_hash = ?
+                  AND (EXISTS (SELECT 1 FROM tasks t WHERE t.run_id = r.id AND t.state != 'done')
+                       OR NOT EXISTS (SELECT 1 FROM tasks t WHERE t.run_id = r.id))
+                ORDER BY r.id DESC LIMIT 1
+            """, (campaign_id, kind, params_hash)).fetchone()
+
+        if row:
+            # Claim the lease only if nobody (in any process) took it since it was read
+            claimed = not is_job_owner_alive(row["owner"], row["heartbeat"]) and conn.execute(
+                "UPDATE runs SET owner = ?, heartbeat = ? WHERE id = ? AND owner IS ? AND heartbeat IS ?",
+                (owner, time.time(), row["id"], row["owner"], row["heartbeat"])
+            ).rowcount == 1
+            if not claimed:
+                raise RuntimeError(f"This {kind.replace('_', ' ')} run for campaign {campaign_id} is already in progress in another session; "
+                                   "wait for it to finish or use Force regenerate")
+            run_id, timestamp = row["id"], row["timestamp"]
+        else:
+            timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            cursor = conn.execute(
+                "INSERT INTO runs (campaign_id, kind, params, params_hash, timestamp, created_at, owner, heartbeat) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (campaign_id, kind, params_json, params_hash, timestamp, datetime.now().isoformat(), owner, time.time())
+            )
+            run_id = cursor.lastrowid
+
+        _job_leases[run_id] = owner
+        if _job_heartbeat_thread is None:
+            _job_heartbeat_thread = threading.Thread(target=keep_job_leases_alive, name="job-heartbeat", daemon=True)
+            _job_heartbeat_thread.start()
+
+    return run_id, timestamp
+
+
+def register_job_tasks(run_id: int, entries: List[Tuple[str, Path]]):
+    """Record a run's tasks as pending (tasks already recorded keep their state)."""
+    now = datetime.now().isoformat()
+    with _job_db_lock, closing(get_job_db()) as conn, conn:
+        conn.executemany(
+            "INSERT OR IGNORE INTO tasks (run_id, task_key, state, output_path, updated_at) VALUES (?, ?, 'pending', ?, ?)",
+            [(run_id, task_key, str(output_path), now) for task_key, output_path in entries]
+        )
+
+
+def finish_job_task(run_id: int, task_key: str, state: str, error: Optional[str] = None):
+    """Record the outcome of a task ('done' or 'failed')."""
+    with _job_db_lock, closing(get_job_db()) as conn, conn:
+        conn.execute(
+            "UPDATE tasks SET state = ?, error = ?, updated_at = ? WHERE run_id = ? AND task_key = ?",
+            (state, error, datetime.now().isoformat(), run_id, task_key)
+        )
+
+
+def run_job_task(run_id: int, task_key: str, filepath: Path, task: Callable[[], Optional[str]]) -> Optional[str]:
+    """Run one generation task under the job queue.
+
+    A task whose output file already exists (written before a crash or by an
+    earlier attempt of the same run) is marked done without calling the API.
+    """
+    if filepath.exists():
+        finish_job_task(run_id, task_key, "done")
+        return str(filepath)
+
+    try:
+        result = task()
+    except Exception as e:
+        finish_job_task(run_id, task_key, "failed", str(e))
+        raise
+
+    if result:
+        finish_job_task(run_id, task_key, "done")
+    else:
+        finish_job_task(run_id, task_key, "failed", "No image returned")
+    return result
+
+
+def get_unfinished_job_runs(campaign_id: Optional[str] = None) -> List[dict]:
+    """List runs that still have pending tasks, oldest first ("running" if a handler still holds their lease)."""
+    query = """
+        SELECT r.id, r.campaign_id, r.kind, r.params, r.timestamp, r.owner, r.heartbeat,
+               SUM(t.state = 'done') AS done, COUNT(*) AS total
+        FROM runs r JOIN tasks t ON t.run_id = r.id
+        {where}
+        GROUP BY r.id
+        HAVING SUM(t.state = 'pending') > 0
+        ORDER BY r.id
+    """
+    if not JOB_DB_PATH.exists():
+        return []
+
+    with _job_db_lock, closing(get_job_db()) as conn:
+        if campaign_id:
+            rows = conn.execute(query.format(where="WHERE r.campaign_id = ?"), (campaign_id,)).fetchall()
+        else:
+            rows = conn.execute(query.format(where="")).fetchall()
+
+    return [
+        {
+            "run_id": row["id"],
+            "campaign_id": row["campaign_id"],
+            "kind": row["kind"],
+            "params": json.loads(row["params"]),
+            "done": row["done"],
+            "total": row["total"],
+            "running": is_job_owner_alive(row["owner"], row["heartbeat"])
+        }
+        for row in rows
+    ]
+
+
+def format_unfinished_jobs() -> str:
+    """Format unfinished runs as markdown for the Settings tab."""
+    runs = get_unfinished_job_runs()
+    if not runs:
+        return "*No unfinished generation jobs.*"
+
+    lines = [f"**{len(runs)} unfinished job(s):**", ""]
+    for run in runs:
+        lines.append(f"- `{run['campaign_id']}` {run['kind'].replace('_', ' ')}: {run['done']}/{run['total']} task(s) done" + (" (running)" if run["running"] else ""))
+    return "\n".join(lines)
+
+
+def resume_job_runs(campaign_id: Optional[str] = None) -> str:
+    """Resume unfinished runs that no handler is executing; only their incomplete tasks are generated again."""
+    runs = get_unfinished_job_runs(campaign_id)
+    if not runs:
+        return "*No unfinished generation jobs.*"
+
+    statuses = []
+    for run in runs:
+        if run["running"]:
+            statuses.append(f"**{run['campaign_id']} ({run['kind'].replace('_', ' ')})**\n\n⏳ Already in progress in another session")
+            continue
+        params = run["params"]
+        if run["kind"] == "environments":
+            status, _ = collect_final_result(generate_environments(params["prompt"], run["campaign_id"], contact_sheet=params.get("contact_sheet"), progress=no_progress))
+        elif run["kind"] == "product_views":
+            status, _ = collect_final_result(generate_product_views(params["product_slugs"], params["generation_mode"], run["campaign_id"], contact_sheet=params.get("contact_sheet"), progress=no_progress))
+        elif run["kind"] == "ads":
+            status = collect_final_result(generate_ad_compositions(campaign_id=run["campaign_id"], progress=no_progress, **params))[0]
+        else:
+            continue
+        statuses.append(f"**{run['campaign_id']} ({run['kind'].replace('_', ' ')})**\n\n{status}")
+
+    return "\n\n---\n\n".join(statuses)
+
+
+# ============================================================================
+# Output Encoding
+# ============================================================================
+
+def save_png(image: Image.Image, filepath: Path, quality: Optional[int]):
+    """Save as PNG with zlib optimization (lossless; quality is ignored)."""
+    image.save(filepath, "PNG", optimize=True)
+
+
+def save_webp(image: Image.Image, filepath: Path, quality: Optional[int]):
+    """Save as lossy WebP."""
+    image.save(filepath, "WEBP", quality=quality or 90, method=4)
+
+
+def save_webp_lossless(image: Image.Image, filepath: Path, quality: Optional[int]):
+    """Save as lossless WebP (quality trades encode time for size)."""
+    image.save(filepath, "WEBP", lossless=True, quality=quality or 80, method=4)
+
+
+def save_jpeg(image: Image.Image, filepath: Path, quality: Optional[int]):
+    """Save as high-quality progressive JPEG without chroma subsampling."""
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    image.save(filepath, "JPEG", quality=quality or 92, optimize=True, progressive=True, subsampling=0)
+
+
+# Output encoders by name: (save function, file extension, lossless)
+OUTPUT_ENCODERS = {
+    "png": (save_png, ".png", True),
+    "webp": (save_webp, ".webp", False),
+    "webp-lossless": (save_webp_lossless, ".webp", True),
+    "jpeg": (save_jpeg, ".jpg", False)
+}
+
+
+def sniff_image_format(image_data: bytes) -> Optional[str]:
+    """Identify encoded image bytes by their header, as an OUTPUT_ENCODERS name (None if unknown)."""
+    if image_data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if image_data.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if image_data[:4] == b"RIFF" and image_data[8:12] == b"WEBP":
+        # Simple lossless files start with a VP8L chunk; lossy and extended files are treated as lossy
+        return "webp-lossless" if image_data[12:16] == b"VP8L" else "webp"
+    return None
+
+
+def get_output_format(asset_type: str) -> Tuple[str, Optional[int]]:
+    """Get the (encoder name, quality) configured for an asset type (products, environments or ads)."""
+    spec = OUTPUT_FORMATS.get(asset_type, "png").strip().lower()
+    name, _, quality = spec.partition(":")
+    if name not in OUTPUT_ENCODERS:
+        print(f"Warning: Unknown output format '{spec}' for {asset_type}, using png")
+        return "png", None
+    return name, int(quality) if quality else None
+
+
+def get_output_path(directory: Path, stem: str, asset_type: str) -> Path:
+    """Build the output file path for an asset, using the extension of its configured format."""
+    name, _ = get_output_format(asset_type)
+    return directory / f"{stem}{OUTPUT_ENCODERS[name][1]}"
+
+
+def encode_image(image: Image.Image, filepath: Path, asset_type: str):
+    """Encode an image with the asset type's configured format.
+
+    With OUTPUT_KEEP_MASTERS, assets saved in a lossy format also keep a lossless
+    PNG master in a masters/ folder next to them.
+    """
+    name, quality = get_output_format(asset_type)
+    write_encoded_image(image, str(filepath), name, quality, OUTPUT_KEEP_MASTERS)
+
+
+def save_atomically(save: Callable, image: Image.Image, filepath: Path, quality: Optional[int]):
+    """Save to a temporary file next to filepath and move it into place.
+
+    An existing output file counts as a finished task on resume, so a crash
+    mid-write must never leave a truncated image at the final path.
+    """
+    tmp_path = filepath.with_suffix(f".{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        save(image, tmp_path, quality)
+        os.replace(tmp_path, filepath)
+    finally:
+        tmp_path.unlink(missing_ok=True)
+
+
+def write_encoded_image(image: Image.Image, filepath: str, name: str, quality: Optional[int], keep_master: bool):
+    """Save an image with a resolved encoder (and its PNG master if the encoder is lossy)."""
+    filepath = Path(filepath)
+    save, _, lossless = OUTPUT_ENCODERS[name]
+    save_atomically(save, image, filepath, quality)
+
+    if keep_master and not lossless:
+        masters_dir = filepath.parent / "masters"
+        masters_dir.mkdir(parents=True, exist_ok=True)
+        save_atomically(save_png, image, masters_dir / f"{filepath.stem}.png", None)
+
+
+def decode_and_write_image(image_data: bytes, filepath: str, name: str, quality: Optional[int], keep_master: bool, logo_path: Optional[str] = None, logo_corner: str = "bottom-right") -> str:
+    """Decode model image bytes (adding the logo) and write them with a resolved encoder (runs in an image worker)."""
+    image = Image.open(BytesIO(image_data))
+    if logo_path:
+        image = apply_logo(image.convert("RGB"), logo_path, logo_corner)
+    write_encoded_image(image, filepath, name, quality, keep_master)
+    return filepath
+
+
+# ============================================================================
+# Image Worker Pool
+# ============================================================================
+
+_image_pool = None
+_image_pool_broken = False
+_image_pool_lock = threading.Lock()
+_image_queue_slots = threading.BoundedSemaphore(max(1, IMAGE_QUEUE_SIZE))
+_image_pool_stats = {"passthrough": 0, "offloaded": 0, "inline": 0, "queue_wait_seconds": 0.0}
+
+
+def get_image_pool() -> Optional[ProcessPoolExecutor]:
+    """Get the shared process pool for image decode/encode work (None when IMAGE_WORKERS is 0)."""
+    global _image_pool
+    if IMAGE_WORKERS <= 0 or _image_pool_broken:
+        return None
+    with _image_pool_lock:
+        if _image_pool is None:
+            # Spawned (not forked) workers: the server process runs many threads
+            _image_pool = ProcessPoolExecutor(max_workers=IMAGE_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _image_pool
+
+
+def disable_image_pool():
+    """Shut down a broken image pool and encode on calling threads from now on."""
+    global _image_pool, _image_pool_broken
+    with _image_pool_lock:
+        _image_pool_broken = True
+        if _image_pool is not None:
+            _image_pool.shutdown(wait=False, cancel_futures=True)
+            _image_pool = None
+
+
+def shutdown_image_pool():
+    """Stop the image workers and wait for them to exit (call before the interpreter exits)."""
+    global _image_pool
+    with _image_pool_lock:
+        pool, _image_pool = _image_pool, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def image_worker_ready() -> int:
+    """No-op task used to start image workers (unpickling it imports the app in the worker)."""
+    return os.getpid()
+
+
+def warm_image_pool():
+    """Start the image workers ahead of the first generation (spawned workers import the app once)."""
+    pool = get_image_pool()
+    if pool is not None:
+        try:
+            wait([pool.submit(image_worker_ready) for _ in range(IMAGE_WORKERS)])
+        except BrokenProcessPool as e:
+            print(f"Warning: Could not start image workers ({e}), encoding on calling threads")
+            disable_image_pool()
+
+
+def run_image_job(fn: Callable, *args) -> Any:
+    """Run picklable image work in an image worker process and wait for its result.
+
+    At most IMAGE_QUEUE_SIZE jobs are queued for the workers; callers block until a
+    slot is free. Falls back to running on the calling thread if the pool is
+    disabled or has broken (e.g. workers could not be started).
+    """
+    pool = get_image_pool()
+
+    if pool is not None:
+        wait_start = time.monotonic()
+        with _image_queue_slots:
+            waited = time.monotonic() - wait_start
+            try:
+                result = pool.submit(fn, *args).result()
+                with _image_pool_lock:
+                    _image_pool_stats["offloaded"] += 1
+                    _image_pool_stats["queue_wait_seconds"] += waited
+                return result
+            except BrokenProcessPool as e:
+                if not _image_pool_broken:
+                    print(f"Warning: Image worker pool broke ({e}), encoding on calling threads from now on")
+                disable_image_pool()
+
+    with _image_pool_lock:
+        _image_pool_stats["inline"] += 1
+    return fn(*args)
+
+
+def save_generated_image(image_data: bytes, filepath: Path, asset_type: str) -> str:
+    """Decode and encode generated image bytes to filepath in an image worker process.
+
+    Bytes that are already in the asset's output format are written directly without
+    decoding (see OUTPUT_PASSTHROUGH).
+    """
+    name, quality = get_output_format(asset_type)
+
+    # Already encoded in the target format (and no master to derive): write the bytes as-is
+    if OUTPUT_PASSTHROUGH and sniff_image_format(image_data) == name and (OUTPUT_ENCODERS[name][2] or not OUTPUT_KEEP_MASTERS):
+        tmp_path = Path(filepath).with_suffix(f".{threading.get_ident()}.tmp")
+        tmp_path.write_bytes(image_data)
+        os.replace(tmp_path, filepath)
+        with _image_pool_lock:
+            _image_pool_stats["passthrough"] += 1
+        return str(filepath)
+
+    return run_image_job(decode_and_write_image, image_data, str(filepath), name, quality, OUTPUT_KEEP_MASTERS)
+
+
+def get_image_pool_stats() -> dict:
+    """Get counters for images written as-is and image jobs run in worker processes or on calling threads."""
+    with _image_pool_lock:
+        return dict(_image_pool_stats)
+
+
+# ============================================================================
+# Logo Overlay
+# ============================================================================
+
+LOGO_CORNERS = ("top-left", "top-right", "bottom-left", "bottom-right")
+
+
+def get_logo_corner() -> str:
+    """Get the configured logo corner (AD_LOGO_CORNER), falling back to bottom-right."""
+    if AD_LOGO_CORNER not in LOGO_CORNERS:
+        print(f"Warning: Unknown logo corner '{AD_LOGO_CORNER}', using bottom-right")
+        return "bottom-right"
+    return AD_LOGO_CORNER
+
+
+def prepare_logo(path: str, max_edge: int = 512) -> Optional[Image.Image]:
+    """Load a logo as RGBA trimmed to its visible content (a plain white background is made transparent)."""
+    try:
+        with Image.open(path) as source:
+            logo = source.convert("RGBA")
+    except OSError:
+        return None
+    logo.thumbnail((max_edge, max_edge))
+
+    alpha = logo.getchannel("A")
+    if alpha.getextrema()[0] == 255:
+        # Opaque logo: knock out a white background
+        alpha = get_background_mask(logo, threshold=12).filter(ImageFilter.GaussianBlur(0.5))
+        logo.putalpha(alpha)
+
+    bbox = alpha.getbbox()
+    return logo.crop(bbox) if bbox else None
+
+
+def paste_logo(image: Image.Image, logo: Image.Image, corner: str, scale: float = AD_LOGO_SCALE) -> Image.Image:
+    """Composite a prepared logo into a corner of an image, sized relative to the image width."""
+    width, height = image.size
+    logo = logo.copy()
+    logo.thumbnail((max(1, int(width * scale)), max(1, int(height * scale))), Image.Resampling.LANCZOS)
+    margin = int(min(width, height) * 0.04)
+    x = margin if "left" in corner else width - logo.width - margin
+    y = margin if "top" in corner else height - logo.height - margin
+    image = image.convert("RGBA")
+    image.alpha_composite(logo, (x, y))
+    return image.convert("RGB")
+
+
+def get_prepared_logo(path: str) -> Optional[str]:
+    """Get a logo trimmed to its visible content as a cached RGBA PNG, prepared once per logo file.
+
+    Returns None (with a warning) if the logo cannot be read, e.g. an SVG that was
+    not exported to PNG.
+    """
+    try:
+        cached = LOGO_CACHE_DIR / f"{get_source_hash(path)}.png"
+    except OSError:
+        print(f"Warning: Logo not found: {path}")
+        return None
+    if cached.exists():
+        return str(cached)
+
+    logo = prepare_logo(path, max_edge=1024)
+    if logo is None:
+        print(f"Warning: Could not read logo {path} (export SVG logos to PNG)")
+        return None
+
+    LOGO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = cached.with_suffix(f".{threading.get_ident()}.tmp")
+    logo.save(tmp_path, "PNG")
+    os.replace(tmp_path, cached)
+    return str(cached)
+
+
+def apply_logo(image: Image.Image, logo_path: Optional[str], corner: str) -> Image.Image:
+    """Composite a prepared logo file into a corner of an image (no-op without a logo)."""
+    if not logo_path:
+        return image
+    with Image.open(logo_path) as logo:
+        logo.load()
+        return paste_logo(image, logo.convert("RGBA"), corner)
+
+
+# ============================================================================
+# Text Overlay
+# ============================================================================
+
+# Font files to try per script, searched in AD_FONT_DIR and the usual system font folders
+AD_FONT_CANDIDATES = {
+    "latin": ["NotoSans-Bold.ttf", "DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf", "Arial Bold.ttf", "arialbd.ttf", "Helvetica.ttc"],
+    "cjk": ["NotoSansCJK-Bold.ttc", "NotoSansCJKsc-Bold.otf", "NotoSansSC-Bold.ttf", "NotoSansJP-Bold.ttf", "NotoSansKR-Bold.ttf",
+            "wqy-zenhei.ttc", "PingFang.ttc", "Hiragino Sans GB.ttc", "AppleSDGothicNeo.ttc", "msyhbd.ttc", "msyh.ttc"],
+    "arabic": ["NotoSansArabic-Bold.ttf", "NotoNaskhArabic-Bold.ttf", "DejaVuSans-Bold.ttf", "GeezaPro.ttc", "arialbd.ttf"],
+    "hebrew": ["NotoSansHebrew-Bold.ttf", "DejaVuSans-Bold.ttf", "ArialHB.ttc", "arialbd.ttf"],
+    "thai": ["NotoSansThai-Bold.ttf", "Thonburi.ttc", "tahomabd.ttf"],
+    "devanagari": ["NotoSansDevanagari-Bold.ttf", "Kohinoor.ttc", "mangalb.ttf"]
+}
+FONT_SEARCH_DIRS = [
+    AD_FONT_DIR,
+    Path("/usr/share/fonts"),
+    Path("/usr/local/share/fonts"),
+    Path.home() / ".fonts",
+    Path("/Library/Fonts"),
+    Path("/System/Library/Fonts"),
+    Path("C:/Windows/Fonts")
+]
+RTL_SCRIPTS = {"arabic", "hebrew"}
+
+_font_index = None
+_font_index_lock = threading.Lock()
+_rtl_warning_shown = False
+_font_fallback_warned = set()
+
+
+def detect_script(text: str) -> str:
+    """Detect the script a piece of ad copy needs a font for."""
+    for char in text:
+        code = ord(char)
+        if 0x0590 <= code <= 0x05FF:
+            return "hebrew"
+        if 0x0600 <= code <= 0x06FF or 0x0750 <= code <= 0x077F or 0xFB50 <= code <= 0xFEFF:
+            return "arabic"
+        if 0x0900 <= code <= 0x097F:
+            return "devanagari"
+        if 0x0E00 <= code <= 0x0E7F:
+            return "thai"
+        if 0x3040 <= code <= 0x30FF or 0x3400 <= code <= 0x9FFF or 0xAC00 <= code <= 0xD7AF or 0xFF00 <= code <= 0xFFEF:
+            return "cjk"
+    return "latin"
+
+
+def find_font_file(script: str) -> Optional[str]:
+    """Find an installed font for a script, falling back to Latin fonts."""
+    global _font_index
+    with _font_index_lock:
+        if _font_index is None:
+            _font_index = {}
+            for font_dir in FONT_SEARCH_DIRS:
+                if font_dir.is_dir():
+                    for font_file in font_dir.rglob("*"):
+                        if font_file.suffix.lower() in (".ttf", ".otf", ".ttc"):
+                            _font_index.setdefault(font_file.name.lower(), str(font_file))
+
+    for candidate in AD_FONT_CANDIDATES.get(script, []):
+        if candidate.lower() in _font_index:
+            return _font_index[candidate.lower()]
+    if script != "latin" and script not in _font_fallback_warned:
+        _font_fallback_warned.add(script)
+        print(f"⚠️  No {script} font found - add one to {AD_FONT_DIR}/ (e.g. {AD_FONT_CANDIDATES[script][0]}); glyphs may not render")
+    for candidate in AD_FONT_CANDIDATES["latin"]:
+        if candidate.lower() in _font_index:
+            return _font_index[candidate.lower()]
+    return None
+
+
+def load_ad_font(script: str, size: int) -> ImageFont.FreeTypeFont:
+    """Load the font for a script at a size (Pillow's built-in font if none is installed)."""
+    font_file = find_font_file(script)
+    if font_file:
+        return ImageFont.truetype(font_file, size)
+    return ImageFont.load_default(size)
+
+
+def draw_glyph(font: ImageFont.FreeTypeFont, char: str) -> Tuple[Tuple[int, int], bytes]:
+    """Draw a single character and return its (size, pixels) for comparison."""
+    left, top, right, bottom = font.getbbox(char)
+    glyph = Image.new("L", (max(1, right - left), max(1, bottom - top)))
+    ImageDraw.Draw(glyph).text((-left, -top), char, font=font, fill=255)
+    return glyph.size, glyph.tobytes()
+
+
+def get_missing_glyphs(font: ImageFont.FreeTypeFont, text: str) -> str:
+    """Return the characters of text the font has no glyph for (they would render as notdef boxes)."""
+    notdef = draw_glyph(font, "\U0010FFFF")
+    return "".join(char for char in dict.fromkeys(text) if not char.isspace() and draw_glyph(font, char) == notdef)
+
+
+def wrap_ad_text(text: str, font: ImageFont.FreeTypeFont, max_width: int, script: str) -> List[str]:
+    """Wrap text to a pixel width, breaking between characters for CJK or overlong words."""
+    tokens = list(text) if script == "cjk" else text.split()
+    separator = "" if script == "cjk" else " "
+
+    lines = []
+    current = ""
+    for token in tokens:
+        candidate = f"{current}{separator}{token}" if current else token
+        if font.getlength(candidate) <= max_width:
+            current = candidate
+            continue
+        if current:
+            lines.append(current)
+        # Break a single token that is wider than the line on its own
+        current = ""
+        for char in token:
+            if current and font.getlength(current + char) > max_width:
+                lines.append(current)
+                current = ""
+            current += char
+    if current:
+        lines.append(current)
+    return lines
+
+
+def fit_ad_text(text: str, script: str, box_width: int, box_height: int) -> Tuple[ImageFont.FreeTypeFont, List[str], int]:
+    """Find the largest font size whose wrapped text fits the box. Returns (font, lines, line_height)."""
+    low, high = max(10, box_height // 12), max(12, box_height // 2)
+    best = None
+    while low <= high:
+        size = (low + high) // 2
+        font = load_ad_font(script, size)
+        lines = wrap_ad_text(text, font, box_width, script)
+        line_height = int(size * 1.25)
+        if len(lines) * line_height <= box_height:
+            best = (font, lines, line_height)
+            low = size + 1
+        else:
+            high = size - 1
+
+    if best is None:
+        size = max(10, box_height // 12)
+        font = load_ad_font(script, size)
+        best = (font, wrap_ad_text(text, font, box_width, script), int(size * 1.25))
+    return best
+
+
+def get_text_safe_area(width: int, height: int, logo_corner: Optional[str] = None) -> Tuple[int, int, int, int]:
+    """Get the (left, top, right, bottom) box that locally rendered ad copy is drawn in.
+
+    The box is narrowed (symmetrically, to stay centered) when a logo sits in a top corner.
+    """
+    margin_x = int(width * (0.06 + AD_LOGO_SCALE if logo_corner and logo_corner.startswith("top") else 0.08))
+    top = int(height * 0.05)
+    band_height = int(height * (0.28 if width > height else 0.22))
+    return margin_x, top, width - margin_x, top + band_height
+
+
+def render_text_overlay(image: Image.Image, text: str, logo_corner: Optional[str] = None) -> Image.Image:
+    """Draw ad copy centered in the top safe area of a text-free base creative.
+
+    The text is auto-fitted to the area and drawn in white or near-black (whichever
+    contrasts with the background there) with an outline for legibility. Raises
+    RuntimeError if no installed font has glyphs for the copy, instead of drawing boxes.
+    """
+    global _rtl_warning_shown
+    image = image.convert("RGB")
+    width, height = image.size
+
+    # Safe text area: top band, inset from the edges (the base prompt keeps it clear)
+    margin_x, top, right, bottom = get_text_safe_area(width, height, logo_corner)
+    box_width = right - margin_x
+    band_height = bottom - top
+
+    script = detect_script(text)
+    direction = None
+    if script in RTL_SCRIPTS:
+        if features.check("raqm"):
+            direction = "rtl"
+        else:
+            if not _rtl_warning_shown:
+                print("Warning: Pillow was built without libraqm; right-to-left text is drawn without shaping")
+                _rtl_warning_shown = True
+
+    font, lines, line_height = fit_ad_text(text, script, box_width, band_height)
+    missing = get_missing_glyphs(font, text)
+    if missing:
+        raise RuntimeError(f"No installed font has glyphs for this {script} ad copy (missing: {missing[:10]}); "
+                           f"add a font such as {AD_FONT_CANDIDATES[script][0]} to {AD_FONT_DIR}/ or turn off local ad copy rendering")
+    if direction is None and script in RTL_SCRIPTS:
+        lines = [line[::-1] for line in lines]
+
+    # Pick the text color from the brightness behind the text area
+    luminance = ImageStat.Stat(image.crop((margin_x, top, right, bottom)).convert("L")).mean[0]
+    fill, stroke = ((255, 255, 255), (0, 0, 0)) if luminance < 150 else ((20, 20, 20), (255, 255, 255))
+    stroke_width = max(2, font.size // 14)
+
+    draw = ImageDraw.Draw(image)
+    y = top + (band_height - len(lines) * line_height) // 2
+    for line in lines:
+        line_width = font.getlength(line, direction=direction) if direction else font.getlength(line)
+        x = (width - line_width) / 2
+        draw.text((x, y), line, font=font, fill=fill, stroke_width=stroke_width, stroke_fill=stroke, direction=direction)
+        y += line_height
+
+    return image
+
+
+def render_localized_ad(base_path: str, text: str, filepath: str, name: str, quality: Optional[int], keep_master: bool, logo_path: Optional[str] = None, logo_corner: str = "bottom-right") -> str:
+    """Render ad copy (and the logo) onto a base creative and write it with a resolved encoder (runs in an image worker)."""
+    with Image.open(base_path) as base:
+        image = apply_logo(base.convert("RGB"), logo_path, logo_corner)
+    image = render_text_overlay(image, text, logo_corner if logo_path else None)
+    write_encoded_image(image, filepath, name, quality, keep_master)
+    return filepath
+
+
+# ============================================================================
+# Reframing
+# ============================================================================
+
+# Aspect ratio the master render is generated in when deriving the other formats
+REFRAME_MASTER_RATIO = "1:1"
+REFRAME_ANALYSIS_SIZE = 128
+
+
+def parse_aspect_ratio(aspect_ratio: str) -> float:
+    """Parse an aspect ratio like "16:9" into width / height."""
+    width, height = aspect_ratio.split(":")
+    return float(width) / float(height)
+
+
+def get_saliency_map(image: Image.Image) -> Image.Image:
+    """Compute a small grayscale saliency map of an image.
+
+    Uses a boundary prior: the dominant colors along the image border are taken as
+    background (sky, floor, walls), and each pixel scores its distance to the
+    closest of them, so the subject stands out even against large backdrops.
+    """
+    small = image.convert("RGB")
+    small.thumbnail((REFRAME_ANALYSIS_SIZE, REFRAME_ANALYSIS_SIZE))
+    small = small.filter(ImageFilter.GaussianBlur(1.5))
+    width, height = small.size
+
+    # Dominant border colors: quantize a strip made of the four edges
+    border = Image.new("RGB", (2 * (width + height), 1))
+    border.paste(small.crop((0, 0, width, 1)), (0, 0))
+    border.paste(small.crop((0, height - 1, width, height)), (width, 0))
+    border.paste(small.crop((0, 0, 1, height)).rotate(90, expand=True), (2 * width, 0))
+    border.paste(small.crop((width - 1, 0, width, height)).rotate(90, expand=True), (2 * width + height, 0))
+    palette = border.quantize(6).convert("RGB").getcolors()
+
+    saliency = None
+    for _, color in palette:
+        distance = ImageChops.difference(small, Image.new("RGB", small.size, color)).convert("L")
+        saliency = distance if saliency is None else ImageChops.darker(saliency, distance)
+    return saliency
+
+
+def get_subject_box(saliency: Image.Image, coverage: float = 0.9) -> Tuple[float, float, float, float]:
+    """Estimate the subject's bounding box as fractions (left, top, right, bottom) of the image.
+
+    Keeps the salient pixels (above the mean and 40% of the 98th percentile) and
+    trims the tails of their mass on each axis, so stray highlights do not stretch
+    the box.
+    """
+    width, height = saliency.size
+    histogram = saliency.histogram()
+    cumulative, high = 0, 0
+    for high, count in enumerate(histogram):
+        cumulative += count
+        if cumulative >= 0.98 * width * height:
+            break
+    threshold = max(ImageStat.Stat(saliency).mean[0], 0.4 * high)
+    values = list(saliency.getdata())
+
+    columns = [0.0] * width
+    rows = [0.0] * height
+    for i, value in enumerate(values):
+        if value > threshold:
+            columns[i % width] += value
+            rows[i // width] += value
+
+    def span(mass: List[float]) -> Tuple[float, float]:
+        total = sum(mass)
+        if not total:
+            return 0.0, 1.0
+        tail = total * (1 - coverage) / 2
+        start, acc = 0, 0.0
+        while acc + mass[start] <= tail:
+            acc += mass[start]
+            start += 1
+        end, acc = len(mass) - 1, 0.0
+        while acc + mass[end] <= tail:
+            acc += mass[end]
+            end -= 1
+        return start / len(mass), (end + 1) / len(mass)
+
+    left, right = span(columns)
+    top, bottom = span(rows)
+    return left, top, right, bottom
+
+
+def choose_crop_offset(profile: List[float], window: float, subject: Tuple[float, float], max_start: Optional[float] = None) -> Optional[float]:
+    """Choose where a crop window starts on one axis (all values as fractions of the axis).
+
+    The window must contain the subject span (and start no later than max_start, if
+    given); among the allowed positions the one covering the most saliency wins.
+    Near-ties (e.g. a plain background around the subject) go to the position
+    closest to centering the subject. Returns None if the subject does not fit.
+    """
+    low = max(0.0, subject[1] - window)
+    high = min(subject[0], 1.0 - window)
+    if max_start is not None:
+        high = min(high, max_start)
+    if low > high:
+        return None
+
+    size = len(profile)
+    prefix = [0.0]
+    for value in profile:
+        prefix.append(prefix[-1] + value)
+
+    centered = min(high, max(low, (subject[0] + subject[1] - window) / 2))
+    steps = max(1, int((high - low) * size))
+    candidates = []
+    for offset in [low + (high - low) * step / steps for step in range(steps + 1)] + [centered]:
+        start = int(round(offset * size))
+        end = min(size, int(round((offset + window) * size)))
+        candidates.append((prefix[end] - prefix[start], offset))
+
+    best_mass = max(mass for mass, _ in candidates)
+    return min((offset for mass, offset in candidates if mass >= best_mass * 0.98), key=lambda offset: abs(offset - centered))
+
+
+def pad_to_aspect(image: Image.Image, aspect: float, align_bottom: bool = False) -> Image.Image:
+    """Pad an image to an aspect ratio with a blurred, stretched copy of itself as the backdrop."""
+    width, height = image.size
+    if width / height < aspect:
+        size = (round(height * aspect), height)
+    else:
+        size = (width, round(width / aspect))
+
+    backdrop = image.resize(size, Image.Resampling.BILINEAR).filter(ImageFilter.GaussianBlur(max(size) / 30))
+    x = (size[0] - width) // 2
+    y = size[1] - height if align_bottom else (size[1] - height) // 2
+    backdrop.paste(image, (x, y))
+    return backdrop
+
+
+def reframe_image(image: Image.Image, aspect_ratio: str, keep_text_area: bool = False) -> Image.Image:
+    """Derive another aspect ratio from a master render by saliency-aware cropping and padding.
+
+    The crop keeps the detected subject in frame and, with keep_text_area, below the
+    top text band that locally rendered copy is drawn in. If the subject does not fit
+    a plain crop, the tightest crop around it is padded to the target ratio instead.
+    """
+    image = image.convert("RGB")
+    width, height = image.size
+    aspect = parse_aspect_ratio(aspect_ratio)
+    if abs(width / height - aspect) < 0.01:
+        return image
+
+    saliency = get_saliency_map(image)
+    left, top, right, bottom = get_subject_box(saliency)
+    margin = 0.03
+    subject_x = (max(0.0, left - margin), min(1.0, right + margin))
+    subject_y = (max(0.0, top - margin), min(1.0, bottom + margin))
+
+    if aspect < width / height:
+        # Narrower target: full height, slide the window horizontally
+        window = aspect * height / width
+        columns = [sum(saliency.crop((x, 0, x + 1, saliency.height)).getdata()) for x in range(saliency.width)]
+        offset = choose_crop_offset(columns, window, subject_x)
+        if offset is not None:
+            x0 = round(offset * width)
+            return image.crop((x0, 0, x0 + round(window * width), height))
+        x0, x1 = round(subject_x[0] * width), round(subject_x[1] * width)
+        return pad_to_aspect(image.crop((x0, 0, x1, height)), aspect, align_bottom=keep_text_area)
+
+    # Wider target: full width, slide the window vertically
+    window = width / aspect / height
+    rows = [sum(saliency.crop((0, y, saliency.width, y + 1)).getdata()) for y in range(saliency.height)]
+    offset = None
+    if keep_text_area:
+        _, _, _, text_bottom = get_text_safe_area(width, round(window * height))
+        offset = choose_crop_offset(rows, window, subject_y, max_start=subject_y[0] - text_bottom / height)
+    if offset is None:
+        offset = choose_crop_offset(rows, window, subject_y)
+    if offset is not None:
+        y0 = round(offset * height)
+        return image.crop((0, y0, width, y0 + round(window * height)))
+    y0, y1 = round(subject_y[0] * height), round(subject_y[1] * height)
+    return pad_to_aspect(image.crop((0, y0, width, y1)), aspect)
+
+
+def render_reframed_ad(master_path: str, aspect_ratio: str, filepath: str, name: str, quality: Optional[int], keep_master: bool, keep_text_area: bool = False, logo_path: Optional[str] = None, logo_corner: str = "bottom-right") -> str:
+    """Reframe a master render to an aspect ratio (adding the logo) and write it with a resolved encoder (runs in an image worker)."""
+    with Image.open(master_path) as master:
+        image = apply_logo(reframe_image(master, aspect_ratio, keep_text_area), logo_path, logo_corner)
+    write_encoded_image(image, filepath, name, quality, keep_master)
+    return filepath
+
+
+# ============================================================================
+# Contact Sheets
+# ============================================================================
+
+# Grid layouts (columns, rows, API aspect ratio) for contact sheet generation
+CONTACT_SHEET_GRIDS = {
+    "products": (3, 2, "3:2"),
+    "environments": (2, 2, "1:1")
+}
+CONTACT_SHEET_ANALYSIS_SIZE = 600
+
+
+def get_line_scores(image: Image.Image, axis: int) -> List[float]:
+    """Score every column (axis=0) or row (axis=1) by how little it looks like a white gutter.
+
+    A uniform white line scores 0; texture and darker tones raise the score.
+    """
+    gray = image.convert("L")
+    gray.thumbnail((CONTACT_SHEET_ANALYSIS_SIZE, CONTACT_SHEET_ANALYSIS_SIZE))
+    width, height = gray.size
+    scores = []
+    for i in range(width if axis == 0 else height):
+        line = gray.crop((i, 0, i + 1, height) if axis == 0 else (0, i, width, i + 1))
+        stat = ImageStat.Stat(line)
+        scores.append(stat.stddev[0] + (255 - stat.mean[0]) * 0.5)
+    return scores
+
+
+def find_sheet_cuts(scores: List[float], cells: int) -> List[Tuple[float, float]]:
+    """Find the span (start, end) of each cell along one axis, as fractions of the sheet.
+
+    Each expected cell boundary is searched for the most gutter-like line nearby; a
+    run of gutter lines is cut away (or split in the middle when it is wide, e.g. the
+    white background between two product shots). Without a visible gutter the sheet
+    is split at the expected position.
+    """
+    size = len(scores)
+    search = max(1, int(size / cells * 0.1))
+    max_gutter = size * 0.06
+
+    def gutter_run(center: int) -> Tuple[int, int]:
+        low, high = max(0, center - search), min(size - 1, center + search)
+        best = min(range(low, high + 1), key=lambda i: scores[i])
+        if scores[best] > 12:
+            return center, center
+        limit = scores[best] + 4
+        start = end = best
+        while start > 0 and scores[start - 1] <= limit:
+            start -= 1
+        while end < size - 1 and scores[end + 1] <= limit:
+            end += 1
+        if end - start + 1 > max_gutter:
+            middle = (start + end + 1) // 2
+            return middle, middle
+        return start, end + 1
+
+    # Outer margins: trim a thin uniform border, if the model drew one
+    first = 0
+    while first < max_gutter and scores[first] <= 4:
+        first += 1
+    last = size
+    while size - last < max_gutter and scores[last - 1] <= 4:
+        last -= 1
+    if first >= max_gutter:
+        first = 0
+    if size - last >= max_gutter:
+        last = size
+
+    spans = []
+    start = first
+    for k in range(1, cells):
+        gutter_start, gutter_end = gutter_run(round(size * k / cells))
+        spans.append((start / size, gutter_start / size))
+        start = gutter_end
+    spans.append((start / size, last / size))
+    return spans
+
+
+def get_sheet_tile_boxes(sheet: Image.Image, columns: int, rows: int) -> List[Tuple[int, int, int, int]]:
+    """Get the pixel box of every tile of a contact sheet, row by row."""
+    width, height = sheet.size
+    column_spans = find_sheet_cuts(get_line_scores(sheet, 0), columns)
+    row_spans = find_sheet_cuts(get_line_scores(sheet, 1), rows)
+    return [
+        (round(left * width), round(top * height), round(right * width), round(bottom * height))
+        for top, bottom in row_spans
+        for left, right in column_spans
+    ]
+
+
+def write_sheet_tile(sheet_path: str, columns: int, rows: int, index: int, filepath: str, name: str, quality: Optional[int], keep_master: bool) -> str:
+    """Slice one tile out of a contact sheet, upscale it to CONTACT_SHEET_TILE_SIZE and write it (runs in an image worker)."""
+    with Image.open(sheet_path) as sheet:
+        sheet = sheet.convert("RGB")
+        tile = sheet.crop(get_sheet_tile_boxes(sheet, columns, rows)[index])
+    tile = ImageOps.fit(tile, (CONTACT_SHEET_TILE_SIZE, CONTACT_SHEET_TILE_SIZE), Image.Resampling.LANCZOS)
+    tile = tile.filter(ImageFilter.UnsharpMask(radius=2, percent=60, threshold=2))
+    write_encoded_image(tile, filepath, name, quality, keep_master)
+    return filepath
+
+
+# ============================================================================
+# Local Preview
+# ============================================================================
+
+PREVIEW_MAX_EDGE = 720
+PREVIEW_RATIOS = {"1_1": "1:1", "9_16": "9:16", "16_9": "16:9"}
+# Product height as a fraction of the frame height, per aspect ratio
+PREVIEW_PRODUCT_HEIGHT = {"1_1": 0.55, "9_16": 0.42, "16_9": 0.62}
+
+_cutout_cache = {}
+_cutout_cache_lock = threading.Lock()
+
+
+def get_background_mask(image: Image.Image, threshold: int = 24) -> Image.Image:
+    """Get a mask of everything that differs from a white (#FFFFFF) background."""
+    white = Image.new("RGB", image.size, (255, 255, 255))
+    return ImageChops.difference(image.convert("RGB"), white).convert("L").point(lambda v: 255 if v > threshold else 0)
+
+
+def fill_mask_holes(mask: Image.Image) -> Image.Image:
+    """Fill enclosed holes in a mask (e.g. white labels on a product) at low resolution.
+
+    The background is flood-filled from the border of a small copy, so anything it
+    cannot reach belongs to the subject; the result is scaled back up and eroded so
+    the fine edges still come from the full-resolution mask.
+    """
+    small = mask.copy()
+    small.thumbnail((160, 160))
+    padded = Image.new("L", (small.width + 2, small.height + 2), 0)
+    padded.paste(small.point(lambda v: 255 if v > 127 else 0), (1, 1))
+    ImageDraw.floodfill(padded, (0, 0), 128)
+    filled = padded.crop((1, 1, small.width + 1, small.height + 1)).point(lambda v: 0 if v == 128 else 255)
+    filled = filled.resize(mask.size, Image.Resampling.BILINEAR).filter(ImageFilter.MinFilter(5))
+    return ImageChops.lighter(mask, filled)
+
+
+def cut_out_product(path: str) -> Optional[Image.Image]:
+    """Cut a product out of its white-background view (RGBA, cropped to the product), cached by file and mtime.
+
+    Returns the whole photo as-is if it has no white background to remove.
+    """
+    key = (path, get_mtime(Path(path)))
+    with _cutout_cache_lock:
+        if key in _cutout_cache:
+            return _cutout_cache[key]
+
+    try:
+        with Image.open(path) as source:
+            image = source.convert("RGB")
+    except OSError:
+        return None
+    image.thumbnail((PREVIEW_MAX_EDGE, PREVIEW_MAX_EDGE))
+
+    mask = get_background_mask(image)
+    # Close specks, then pull the edge in by a pixel so no white fringe is left
+    mask = mask.filter(ImageFilter.MaxFilter(3)).filter(ImageFilter.MinFilter(3))
+    mask = fill_mask_holes(mask).filter(ImageFilter.MinFilter(3)).filter(ImageFilter.GaussianBlur(1))
+
+    cutout = image.convert("RGBA")
+    bbox = mask.getbbox()
+    if bbox and (bbox[2] - bbox[0]) * (bbox[3] - bbox[1]) < 0.95 * image.width * image.height:
+        cutout.putalpha(mask)
+        cutout = cutout.crop(bbox)
+
+    with _cutout_cache_lock:
+        if len(_cutout_cache) > 32:
+            _cutout_cache.clear()
+        _cutout_cache[key] = cutout
+    return cutout
+
+
+def composite_preview(environment: Image.Image, product: Image.Image, name: str, text: str = "", logo: Optional[Image.Image] = None) -> Image.Image:
+    """Roughly composite a product cutout, logo and copy onto an environment for one aspect ratio."""
+    aspect = parse_aspect_ratio(PREVIEW_RATIOS[name])
+    if aspect >= 1:
+        size = (PREVIEW_MAX_EDGE, round(PREVIEW_MAX_EDGE / aspect))
+    else:
+        size = (round(PREVIEW_MAX_EDGE * aspect), PREVIEW_MAX_EDGE)
+    frame = ImageOps.fit(environment.convert("RGB"), size, Image.Resampling.BILINEAR)
+    width, height = size
+
+    # Scale: target height, limited by the frame width and by the text area above it
+    baseline = int(height * 0.92)
+    _, _, _, text_bottom = get_text_safe_area(width, height)
+    max_height = min(height * PREVIEW_PRODUCT_HEIGHT[name], baseline - text_bottom - height * 0.03 if text else height)
+    scale = min(max_height / product.height, width * 0.7 / product.width)
+    product = product.resize((max(1, round(product.width * scale)), max(1, round(product.height * scale))), Image.Resampling.LANCZOS)
+    x = (width - product.width) // 2
+    y = baseline - product.height
+
+    # Soft contact shadow under the product
+    shadow = Image.new("L", size, 0)
+    shadow_height = max(4, product.height // 12)
+    ImageDraw.Draw(shadow).ellipse((x + product.width * 0.08, baseline - shadow_height // 2, x + product.width * 0.92, baseline + shadow_height // 2), fill=110)
+    shadow = shadow.filter(ImageFilter.GaussianBlur(max(2, shadow_height // 2)))
+    frame = Image.composite(Image.new("RGB", size, (0, 0, 0)), frame, shadow)
+
+    frame = frame.convert("RGBA")
+    frame.alpha_composite(product, (x, y))
+    frame = frame.convert("RGB")
+
+    corner = get_logo_corner()
+    if logo is not None:
+        frame = paste_logo(frame, logo, corner)
+    if text:
+        frame = render_text_overlay(frame, text, corner if logo is not None else None)
+    return frame
+
+
+def render_instant_preview(selected_envs: List[str], selected_products: List[str], campaign_msg: str, selected_logos: List[str], include_logo_1_1: bool, include_logo_9_16: bool, include_logo_16_9: bool) -> Tuple[str, List[Tuple[Image.Image, str]]]:
+    """Render a rough local preview of the ad in all three aspect ratios, without any API calls.
+
+    Uses the first selected environment, product view and logo, like generate_ad_compositions.
+    """
+    if not selected_envs or not selected_products:
+        return "⚠️ Select at least one environment and one product view to preview", []
+
+    start = time.perf_counter()
+    product = cut_out_product(selected_products[0])
+    if product is None:
+        return "❌ Could not read the selected product view", []
+    try:
+        with Image.open(selected_envs[0]) as source:
+            environment = source.convert("RGB")
+    except OSError:
+        return "❌ Could not read the selected environment", []
+    environment.thumbnail((PREVIEW_MAX_EDGE, PREVIEW_MAX_EDGE))
+    logo = None
+    logo_path = get_prepared_logo(selected_logos[0]) if selected_logos else None
+    if logo_path:
+        with Image.open(logo_path) as source:
+            logo = source.convert("RGBA")
+
+    include_logo = {"1_1": include_logo_1_1, "9_16": include_logo_9_16, "16_9": include_logo_16_9}
+    text = campaign_msg.strip() if campaign_msg else ""
+    font_warning = ""
+    if text and get_missing_glyphs(load_ad_font(detect_script(text), 32), text):
+        font_warning = f"\n\n⚠️ No installed font has glyphs for this message, so it is left out of the preview (add one to `{AD_FONT_DIR}/`)"
+        text = ""
+    previews = []
+    for name, ratio in PREVIEW_RATIOS.items():
+        frame = composite_preview(environment, product, name, text, logo if include_logo[name] else None)
+        previews.append((frame, f"{ratio} preview"))
+
+    elapsed = time.perf_counter() - start
+    return f"⚡ Rendered {len(previews)} local previews in {elapsed:.2f}s (no API calls). This is a rough composite; the generated ads will blend product and scene properly.{font_warning}", previews
+
+
+# ============================================================================
+# Generation Executor
+# ============================================================================
+
+_generation_executor: Optional[ThreadPoolExecutor] = None
+_generation_executor_lock = threading.Lock()
+
+
+def get_generation_executor() -> ThreadPoolExecutor:
+    """Get the shared thread pool that all image generation calls are submitted to.
+
+    The pool is created lazily and sized by MAX_CONCURRENT_GENERATIONS, which
+    bounds the number of model calls in flight across every handler.
+    """
+    global _generation_executor
+    with _generation_executor_lock:
+        if _generation_executor is None:
+            _generation_executor = ThreadPoolExecutor(
+                max_workers=max(1, MAX_CONCURRENT_GENERATIONS),
+                thread_name_prefix="generation"
+            )
+        return _generation_executor
+
+
+def iter_generation_tasks(tasks: List[Callable[[], Any]], max_parallel: Optional[int] = None, requires: Optional[List[Optional[Callable]]] = None):
+    """Run generation tasks concurrently on the shared executor, yielding each as it finishes.
+
+    Args:
+        tasks: Zero-argument callables, one per generation
+        max_parallel: Optional cap on how many of these tasks (and their shared
+            steps) are in flight at once. The shared executor size still bounds
+            the global total.
+        requires: Optional list with, per task, the run_once step it reads
+            (e.g. a shared base render or contact sheet) or None. Each step is
+            submitted as its own job, after the step it requires in turn, and a
+            task is only submitted once its step has finished, so no worker
+            blocks waiting on another. Steps of different tasks run concurrently.
+
+    Yields:
+        (completed_count, task_index, result, error) tuples in completion order.
+        A failed task has result None and the raised exception as error.
+        A failed step fails every task requiring it with the step's error.
+    """
+    if not tasks:
+        return
+
+    executor = get_generation_executor()
+    limit = max(1, max_parallel) if max_parallel else len(tasks)
+    requires = requires or [None] * len(tasks)
+
+    pending = {}
+    waiting = list(range(len(tasks)))
+    started_steps = set()
+    finished_steps = set()
+    completed = 0
+
+    def next_job():
+        """Pick the first waiting task that can run, or the first step blocking one."""
+        for position, idx in enumerate(waiting):
+            step = requires[idx]
+            # Walk up to the earliest unfinished step this task depends on
+            while step is not None and step not in finished_steps:
+                parent = step.requires
+                if parent is None or parent in finished_steps:
+                    break
+                step = parent
+            if step is None or step in finished_steps:
+                del waiting[position]
+                return tasks[idx], idx
+            if step not in started_steps:
+                started_steps.add(step)
+                return step, step
+        return None, None
+
+    while waiting or pending:
+        # Keep at most `limit` jobs submitted at a time
+        while len(pending) < limit:
+            job, key = next_job()
+            if job is None:
+                break
+            pending[executor.submit(job)] = key
+
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            key = pending.pop(future)
+            if not isinstance(key, int):
+                # Steps keep their own result or error for the tasks that read them
+                finished_steps.add(key)
+                continue
+            completed += 1
+            try:
+                yield completed, key, future.result(), None
+            except Exception as e:
+                yield completed, key, None, e
+
+
+def run_once(fn: Callable, requires: Optional[Callable] = None) -> Callable:
+    """Wrap a no-argument callable so all callers share one execution (its result or its error).
+
+    The wrapper can be passed as a task's step to iter_generation_tasks; requires
+    names another run_once step that the scheduler must finish before this one.
+    """
+    lock = threading.Lock()
+    state = {}
+
+    def wrapper():
+        with lock:
+            if not state:
+                try:
+                    state["result"] = fn()
+                except Exception as e:
+                    state["error"] = e
+        if "error" in state:
+            raise state["error"]
+        return state["result"]
+
+    wrapper.requires = requires
+    return wrapper
+
+
+def collect_final_result(stream):
+    """Drain a streaming generation handler and return its final yielded value."""
+    result = None
+    for result in stream:
+        pass
+    return result
+
+
+def format_generation_errors(labels: List[str], results: List[Tuple[Any, Optional[Exception]]]) -> str:
+    """Build a status message suffix listing failed generation tasks."""
+    failures = [(label, error) for label, (_, error) in zip(labels, results) if error is not None]
+    if not failures:
+        return ""
+
+    lines = [f"\n\n⚠️ {len(failures)} generation(s) failed:"]
+    for label, error in failures:
+        lines.append(f"- {label}: {str(error)}")
+    return "\n".join(lines)
+
+
+def generate_image(client, contents, aspect_ratio: str, force_regenerate: bool = False, meter: Optional[dict] = None) -> Optional[bytes]:
+    """Call the image model and return the first generated image's bytes, if any.
+
+    Identical requests are served from the generation cache unless
+    force_regenerate is set, in which case the fresh result replaces the cached one.
+    Every attempt actually sent is counted in the upload totals (and in meter, if given).
+    """
+    cache_key = generation_cache_key(contents, aspect_ratio)
+    if not force_regenerate:
+        cached = get_cached_generation(cache_key)
+        if cached:
+            return cached
+
+    request_size = get_request_size(contents)
+
+    def request():
+        record_upload(request_size, meter)
+        return client.models.generate_content(
+            model=IMAGE_MODEL,
+            contents=contents,
+            config=types.GenerateContentConfig(
+                response_modalities=["IMAGE"],
+                image_config=types.ImageConfig(
+                    aspect_ratio=aspect_ratio,
+                )
+            )
+        )
+
+    response = call_with_retry(request)
+
+    if response and response.candidates and len(response.candidates) > 0:
+        candidate = response.candidates[0]
+        if candidate.content and candidate.content.parts:
+            for part in candidate.content.parts:
+                if part.inline_data:
+                    store_cached_generation(cache_key, part.inline_data.data)
+                    return part.inline_data.data
+
+    return None
+
+
+def generate_and_save_image(client, contents, aspect_ratio: str, filepath: Path, asset_type: str, force_regenerate: bool = False, meter: Optional[dict] = None) -> Optional[str]:
+    """Generate a single image and save it in the asset type's output format.
+
+    Returns the saved path, or None if no image was returned.
+    """
+    image_data = generate_image(client, contents, aspect_ratio, force_regenerate, meter)
+    if not image_data:
+        return None
+
+    # Decode/encode in an image worker so CPU work overlaps other requests' network waits
+    return save_generated_image(image_data, filepath, asset_type)
+
+
+def generate_intermediate_image(client, contents, aspect_ratio: str, filepath: Path, force_regenerate: bool = False, meter: Optional[dict] = None) -> str:
+    """Generate an image other assets are derived from (ad base, master, contact sheet) as a lossless PNG.
+
+    Reuses the file if it was already saved for this run.
+    """
+    if filepath.exists():
+        return str(filepath)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    result = generate_and_save_image(client, contents, aspect_ratio, filepath, "intermediate", force_regenerate, meter)
+    if not result:
+        raise RuntimeError("No image returned")
+    return result
+
+
+def derive_ad_base(get_master: Callable, aspect_ratio: str, filepath: Path) -> str:
+    """Derive an aspect ratio's text-free base from the (shared) master render, keeping the text area clear."""
+    master_path = get_master()
+    if filepath.exists():
+        return str(filepath)
+    filepath.parent.mkdir(parents=True, exist_ok=True)
+    name, quality = get_output_format("intermediate")
+    return run_image_job(render_reframed_ad, master_path, aspect_ratio, str(filepath), name, quality, False, True)
+
+
+def render_reframed_variant(get_master: Callable, aspect_ratio: str, filepath: Path, logo_path: Optional[str] = None) -> str:
+    """Crop/pad one aspect ratio of an ad from its (shared) master render."""
+    master_path = get_master()
+    name, quality = get_output_format("ads")
+    return run_image_job(render_reframed_ad, master_path, aspect_ratio, str(filepath), name, quality, OUTPUT_KEEP_MASTERS, False, logo_path, get_logo_corner())
+
+
+def render_sheet_tile(get_sheet: Callable, columns: int, rows: int, index: int, filepath: Path, asset_type: str) -> str:
+    """Slice one tile out of the (shared) contact sheet and save it as an asset."""
+    sheet_path = get_sheet()
+    name, quality = get_output_format(asset_type)
+    return run_image_job(write_sheet_tile, sheet_path, columns, rows, index, str(filepath), name, quality, OUTPUT_KEEP_MASTERS)
+
+
+def render_ad_variant(get_base: Callable, text: str, filepath: Path, logo_path: Optional[str] = None) -> str:
+    """Render one message (and the logo) onto the (shared) base creative of its aspect ratio."""
+    base_path = get_base()
+    name, quality = get_output_format("ads")
+    return run_image_job(render_localized_ad, base_path, text, str(filepath), name, quality, OUTPUT_KEEP_MASTERS, logo_path, get_logo_corner())
+
+
+def generate_and_save_ad(client, contents, aspect_ratio: str, filepath: Path, force_regenerate: bool, logo_path: str, meter: Optional[dict] = None) -> Optional[str]:
+    """Generate an ad and composite the prepared logo into it locally before it is encoded."""
+    image_data = generate_image(client, contents, aspect_ratio, force_regenerate, meter)
+    if not image_data:
+        return None
+    name, quality = get_output_format("ads")
+    return run_image_job(decode_and_write_image, image_data, str(filepath), name, quality, OUTPUT_KEEP_MASTERS, logo_path, get_logo_corner())
+
+
+def load_reference_images(photo_paths: List[str]) -> List[types.Part]:
+    """Load reference photos as prepared request parts, skipping files that cannot be read."""
+    reference_images = []
+    for photo_path in photo_paths:
+        try:
+            reference_images.append(prepare_reference_image(photo_path))
+        except Exception as e:
+            print(f"Warning: Could not load {photo_path}: {e}")
+    return reference_images
+
+
+def build_contact_sheet_prompt(intro: str, cells: List[str], requirements: str, columns: int, rows: int) -> str:
+    """Build the prompt for a contact sheet: one grid image holding several related photographs."""
+    layout = "\n".join(f"- Row {i // columns + 1}, column {i % columns + 1}: {cell}" for i, cell in enumerate(cells))
+    return f"""{intro}
+
+Generate a CONTACT SHEET: one image containing a grid of {len(cells)} square photographs, {columns} columns by {rows} rows, separated by thin pure white gutters.
+
+GRID LAYOUT:
+{layout}
+
+REQUIREMENTS FOR EVERY CELL:
+{requirements}
+- Each photograph fills its own square cell and stays completely inside it
+- Equal cell sizes and straight gutters
+- No borders, frames, numbers, labels or captions"""
+
+
+def generate_product_views(product_slugs, generation_mode: str, campaign_id: str, force_regenerate: bool = False, contact_sheet: Optional[bool] = None, progress=gr.Progress()) -> Iterator[Tuple[str, List[str]]]:
+    """Generate all product views using Gemini 2.5 Flash Image with existing product photos as reference.
+
+    With contact_sheet (default: CONTACT_SHEET_MODE), each product (or the combined
+    set) is generated as one 3x2 grid image that is sliced into the views locally.
+
+    Yields (status, image_paths) after every finished view so the gallery fills in as images arrive.
+    """
+
+    # Handle both single string and list
+    if isinstance(product_slugs, str):
+        product_slugs = [product_slugs]
+
+    # Check products selected
+    if not product_slugs:
+        yield "❌ Error: Please select at least one product first", []
+        return
+
+    # Check API key
+    api_key = os.getenv("GOOGLE_API_KEY")
+    if not api_key or api_key == "your_api_key_here":
+        yield "❌ Error: Please configure your API key in Settings tab first", []
+        return
+
+    # Create campaign directory structure (use campaign_id only, no timestamp)
+    campaign_dir = Path("outputs") / campaign_id
+
+    generated_images = []
+
+    run_id = None
+    try:
+        # Get the pooled Gemini client
+        client = get_genai_client(api_key)
+
+        if contact_sheet is None:
+            contact_sheet = CONTACT_SHEET_MODE
+
+        # Start (or resume) this run in the job queue
+        run_id, timestamp = start_job_run(campaign_id, "product_views", {"product_slugs": product_slugs, "generation_mode": generation_mode, "contact_sheet": contact_sheet}, force_regenerate)
+
+        # Each task generates one view; all tasks are submitted to the shared executor
+        # (with contact sheets, each sheet is a step rendered before the tiles cut from it)
+        tasks = []
+        task_steps = []
+        task_labels = []
+        job_entries = []
+        sheet_count = 0
+        columns, rows, sheet_ratio = CONTACT_SHEET_GRIDS["products"]
+
+        if generation_mode == "separate":
+            # Generate separate views for each product
+            for product_idx, product_slug in enumerate(product_slugs):
+                progress((product_idx) / len(product_slugs), desc=f"Loading {product_slug}...")
+
+                # Load product config
+                config = load_product_config(product_slug)
+                if not config:
+                    continue
+
+                product_info = config.get('product', {})
+                product_name = product_info.get('name', product_slug)
+                description = product_info.get('description', '')
+
+                # Load existing product photos
+                existing_photo_paths = get_product_images(product_slug, "product")
+                if not existing_photo_paths:
+                    continue
+
+                # Load as PIL Images
+                reference_images = load_reference_images(existing_photo_paths)
+                if not reference_images:
+                    continue
+
+                # Create product directory in campaign folder
+                generated_dir = campaign_dir / "products" / product_slug
+                generated_dir.mkdir(parents=True, exist_ok=True)
+
+                # Contact sheet: all views of this product come from one grid image
+                if contact_sheet:
+                    sheet_prompt = build_contact_sheet_prompt(
+                        f"Study the provided reference images of this {product_name} product.\n\nProduct details: {description}",
+                        [f"{view_name} view - {view_description}" for view_name, view_description in PRODUCT_VIEWS.items()],
+                        "- The product MUST look identical to the reference images (same shape, size, colors, labels, text, branding)\n- Pure white background (#FFFFFF)\n- Professional studio lighting with soft shadows\n- Product centered at the same scale in every cell\n- Photorealistic rendering, sharp focus",
+                        columns, rows
+                    )
+                    sheet_path = generated_dir / "sheets" / f"sheet_{timestamp}.png"
+                    get_sheet = run_once(partial(generate_intermediate_image, client, [sheet_prompt] + reference_images, sheet_ratio, sheet_path, force_regenerate))
+                    sheet_count += 1
+
+                # Queue each view
+                for view_index, (view_name, view_description) in enumerate(PRODUCT_VIEWS.items()):
+                    prompt = f"""Study the provided reference images of this {product_name} product.
+
+Generate a professional product photography shot with this EXACT camera angle: {view_description}.
+
+Product details: {description}
+
+CRITICAL REQUIREMENTS:
+- The product MUST look identical to the reference images (same shape, size, colors, labels, text, branding)
+- Pure white background (#FFFFFF)
+- Professional studio lighting with soft shadows
+- Camera angle: {view_description}
+- High resolution, sharp focus
+- Photorealistic rendering
+- Square aspect ratio (1:1)
+
+Output only the product photograph from the specified angle. Do not include any text, labels, or annotations."""
+
+                    filepath = get_output_path(generated_dir, f"{view_name}_{timestamp}", "products")
+                    task_key = f"products/{product_slug}/{view_name}"
+                    if contact_sheet:
+                        generate = partial(render_sheet_tile, get_sheet, columns, rows, view_index, filepath, "products")
+                    else:
+                        generate = partial(generate_and_save_image, client, [prompt] + reference_images, "1:1", filepath, "products", force_regenerate)
+                    tasks.append(partial(run_job_task, run_id, task_key, filepath, generate))
+                    task_steps.append(get_sheet if contact_sheet else None)
+                    task_labels.append(f"{product_slug}: {view_name} view")
+                    job_entries.append((task_key, filepath))
+
+            output_dir = campaign_dir / "products"
+
+        else:  # combined mode
+            # Load all product configs and images
+            all_product_names = []
+            all_descriptions = []
+            all_reference_images = []
+
+            for product_slug in product_slugs:
+                config = load_product_config(product_slug)
+                if not config:
+                    continue
+
+                product_info = config.get('product', {})
+                all_product_names.append(product_info.get('name', product_slug))
+                all_descriptions.append(product_info.get('description', ''))
+
+                # Load product photos
+                existing_photo_paths = get_product_images(product_slug, "product")
+                all_reference_images.extend(load_reference_images(existing_photo_paths))
+
+            if not all_reference_images:
+                yield "❌ Error: Could not load any product photos", []
+                return
+
+            # Create output directory for combined images in campaign folder
+            combined_dir = campaign_dir / "products" / "combined"
+            combined_dir.mkdir(parents=True, exist_ok=True)
+
+            # Generate combined views
+            products_str = " and ".join(all_product_names)
+            descriptions_str = ". ".join(all_descriptions)
+
+            # Contact sheet: all combined views come from one grid image
+            if contact_sheet:
+                sheet_prompt = build_contact_sheet_prompt(
+                    f"Study the provided reference images showing multiple products: {products_str}.\n\nProducts: {descriptions_str}",
+                    [f"{view_name} view of ALL products together - {view_description}" for view_name, view_description in PRODUCT_VIEWS.items()],
+                    "- Show ALL products together, arranged the same way in every cell\n- Each product MUST look identical to its reference images (same shape, size, colors, labels, text, branding)\n- Pure white background (#FFFFFF)\n- Professional studio lighting with soft shadows\n- Photorealistic rendering, sharp focus",
+                    columns, rows
+                )
+                sheet_path = combined_dir / "sheets" / f"sheet_{timestamp}.png"
+                get_sheet = run_once(partial(generate_intermediate_image, client, [sheet_prompt] + all_reference_images, sheet_ratio, sheet_path, force_regenerate))
+                sheet_count += 1
+
+            for view_index, (view_name, view_description) in enumerate(PRODUCT_VIEWS.items()):
+                prompt = f"""Study the provided reference images showing multiple products: {products_str}.
+
+Generate a professional product photography shot showing ALL products together in a single composition with this EXACT camera angle: {view_description}.
+
+Products: {descriptions_str}
+
+CRITICAL REQUIREMENTS:
+- Show ALL products together in the same image
+- Each product MUST look identical to its reference images (same shape, size, colors, labels, text, branding)
+- Arrange products in an aesthetically pleasing composition
+- Pure white background (#FFFFFF)
+- Professional studio lighting with soft shadows
+- Camera angle: {view_description}
+- High resolution, sharp focus
+- Photorealistic rendering
+- Square aspect ratio (1:1)
+
+Output only the product photograph from the specified angle showing all products together."""
+
+                filepath = get_output_path(combined_dir, f"combined_{view_name}_{timestamp}", "products")
+                task_key = f"products/combined/{view_name}"
+                if contact_sheet:
+                    generate = partial(render_sheet_tile, get_sheet, columns, rows, view_index, filepath, "products")
+                else:
+                    generate = partial(generate_and_save_image, client, [prompt] + all_reference_images, "1:1", filepath, "products", force_regenerate)
+                tasks.append(partial(run_job_task, run_id, task_key, filepath, generate))
+                task_steps.append(get_sheet if contact_sheet else None)
+                task_labels.append(f"combined {view_name} view")
+                job_entries.append((task_key, filepath))
+
+            output_dir = combined_dir
+
+        register_job_tasks(run_id, job_entries)
+
+        # Stream each view into the gallery as soon as it is ready
+        results = [(None, None)] * len(tasks)
+        for completed, idx, result, error in iter_generation_tasks(tasks, requires=task_steps):
+            results[idx] = (result, error)
+            progress(completed / len(tasks), desc=f"Generated {task_labels[idx]} ({completed}/{len(tasks)})...")
+            generated_images = [path for path, _ in results if path]
+            yield f"⏳ Generating product views... {completed}/{len(tasks)} done", generated_images
+
+        errors = format_generation_errors(task_labels, results)
+        sheet_note = f"\n\n🗂️ Contact sheet mode: {sheet_count} API call(s) for {len(tasks)} views (sheets in `sheets/`)" if contact_sheet else ""
+
+        if generation_mode == "separate":
+            yield f"✅ Successfully generated {len(generated_images)} separate product views for {len(product_slugs)} product(s)!\n\n**Campaign Folder:** `{campaign_dir}/`\n\nProducts saved to: `{output_dir}/`{sheet_note}{errors}", generated_images
+            return
+
+        yield f"✅ Successfully generated {len(generated_images)} combined product views showing {len(product_slugs)} product(s) together!\n\n**Campaign Folder:** `{campaign_dir}/`\n\nProducts saved to: `{output_dir}/`{sheet_note}{errors}", generated_images
+
+    except Exception as e:
+        yield f"❌ Error during generation: {str(e)}", generated_images
+    finally:
+        release_job_run(run_id)
+
+
+# ============================================================================
+# Translation Cache
+# ============================================================================
+
+_translation_cache_lock = threading.Lock()
+_translation_cache_stats = {"hits": 0, "misses": 0, "negative_hits": 0}
+
+_translation_executor = None
+_translation_executor_lock = threading.Lock()
+
+
+def get_translation_db() -> sqlite3.Connection:
+    """Open the persistent translation cache, creating the schema on first use."""
+    TRANSLATION_CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(TRANSLATION_CACHE_PATH, timeout=30)
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS translations (
+            text_hash TEXT NOT NULL,
+            source TEXT NOT NULL,
+            target TEXT NOT NULL,
+            translated TEXT,
+            error TEXT,
+            created_at REAL NOT NULL,
+            PRIMARY KEY (text_hash, source, target)
+        )
+    """)
+    return conn
+
+
+def normalize_translation_text(text: str) -> str:
+    """Normalize text so trivially different inputs share a cache entry."""
+    return unicodedata.normalize("NFC", text).strip()
+
+
+def translate_text(text: str, target: str, source: str = "auto") -> str:
+    """Translate text via GoogleTranslator, using the persistent translation cache.
+
+    Successful translations are reused for TRANSLATION_CACHE_TTL_DAYS. Failures
+    are cached for TRANSLATION_NEGATIVE_TTL_SECONDS so a failing language is not
+    retried on every call; a cached failure raises RuntimeError.
+    """
+    normalized = normalize_translation_text(text)
+    text_hash = hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+    now = time.time()
+
+    with _translation_cache_lock, closing(get_translation_db()) as conn:
+        row = conn.execute(
+            "SELECT translated, error, created_at FROM translations WHERE text_hash = ? AND source = ? AND target = ?",
+            (text_hash, source, target)
+        ).fetchone()
+
+        if row:
+            translated, error, created_at = row
+            if translated is not None and now - created_at < TRANSLATION_CACHE_TTL_DAYS * 86400:
+                _translation_cache_stats["hits"] += 1
+                return translated
+            if error is not None and now - created_at < TRANSLATION_NEGATIVE_TTL_SECONDS:
+                _translation_cache_stats["negative_hits"] += 1
+                raise RuntimeError(f"{error} (cached failure)")
+
+        _translation_cache_stats["misses"] += 1
+
+    try:
+        # A fresh translator per call (cheap, no network): translate() mutates instance
+        # state, and sharing one under a lock would let a hung request block the language
+        translated = GoogleTranslator(source=source, target=target).translate(normalized)
+        if not translated:
+            raise RuntimeError("Empty translation returned")
+    except Exception as e:
+        store_translation(text_hash, source, target, None, str(e) or type(e).__name__)
+        raise
+
+    store_translation(text_hash, source, target, translated, None)
+    return translated
+
+
+def get_translation_executor() -> ThreadPoolExecutor:
+    """Get the shared thread pool used for concurrent translations."""
+    global _translation_executor
+    with _translation_executor_lock:
+        if _translation_executor is None:
+            _translation_executor = ThreadPoolExecutor(
+                max_workers=MAX_CONCURRENT_TRANSLATIONS,
+                thread_name_prefix="translate"
+            )
+        return _translation_executor
+
+
+def translate_languages(message: str, lang_codes: List[str]) -> dict:
+    """Translate a message into several languages concurrently.
+
+    Returns a dict mapping each language code to (translated_text, error). English
+    is passed through unchanged and languages found in the bulk translations file
+    are used without a network call. Languages that do not finish within
+    TRANSLATION_TIMEOUT_SECONDS are reported as timed out; their results are still
+    written to the translation cache once they arrive.
+    """
+    results = {}
+    futures = {}
+    executor = get_translation_executor()
+    file_translations = get_file_translations(message)
+
+    for lang_code in lang_codes:
+        if lang_code == 'en':
+            results[lang_code] = (message, None)
+        elif lang_code in file_translations:
+            results[lang_code] = (file_translations[lang_code], None)
+        elif lang_code not in futures.values():
+            futures[executor.submit(translate_text, message, lang_code)] = lang_code
+
+    done, not_done = wait(futures, timeout=TRANSLATION_TIMEOUT_SECONDS)
+
+    for future in done:
+        try:
+            results[futures[future]] = (future.result(), None)
+        except Exception as e:
+            results[futures[future]] = (None, e)
+
+    for future in not_done:
+        results[futures[future]] = (None, TimeoutError(f"Timed out after {TRANSLATION_TIMEOUT_SECONDS:g}s"))
+
+    return results
+
+
+def store_translation(text_hash: str, source: str, target: str, translated: Optional[str], error: Optional[str]):
+    """Write a translation (or a failure) to the persistent cache."""
+    with _translation_cache_lock, closing(get_translation_db()) as conn, conn:
+        conn.execute(
+            "INSERT OR REPLACE INTO translations (text_hash, source, target, translated, error, created_at) VALUES (?, ?, ?, ?, ?, ?)",
+            (text_hash, source, target, translated, error, time.time())
+        )
+
+
+def get_translation_cache_stats() -> dict:
+    """Get translation cache counters and the number of stored translations."""
+    with _translation_cache_lock:
+        stats = dict(_translation_cache_stats)
+        stats["entries"] = 0
+        if TRANSLATION_CACHE_PATH.exists():
+            with closing(get_translation_db()) as conn:
+                stats["entries"] = conn.execute("SELECT COUNT(*) FROM translations WHERE translated IS NOT NULL").fetchone()[0]
+        return stats
+
+
+# ============================================================================
+# Bulk Translation
+# ============================================================================
+
+_translations_file_cache = {"mtime": None, "messages": {}}
+_translations_file_lock = threading.Lock()
+
+
+def load_translations_file() -> dict:
+    """Load the bulk translations file ({normalized message: {lang_code: text}}), cached by mtime."""
+    with _translations_file_lock:
+        if not TRANSLATIONS_FILE.exists():
+            _translations_file_cache.update(mtime=None, messages={})
+            return {}
+
+        mtime = TRANSLATIONS_FILE.stat().st_mtime_ns
+        if _translations_file_cache["mtime"] != mtime:
+            try:
+                with open(TRANSLATIONS_FILE, 'r', encoding='utf-8') as f:
+                    messages = json.load(f).get("messages", {})
+            except (OSError, ValueError) as e:
+                print(f"Warning: Could not read translations file {TRANSLATIONS_FILE}: {e}")
+                messages = {}
+            _translations_file_cache.update(mtime=mtime, messages=messages)
+
+        return _translations_file_cache["messages"]
+
 
-Output only the product photograph from the specified angle showing all products together."""
+def get_file_translations(message: str) -> dict:
+    """Get pre-computed translations of a message from the bulk translations file."""
+    return load_translations_file().get(normalize_translation_text(message), {})
 
-                contents = [prompt] + all_reference_images
-                response = client.models.generate_content(
-                    model="gemini-2.5-flash-image",
-                    contents=contents,
-                    config=types.GenerateContentConfig(
-                        response_modalities=["IMAGE"],
-                        image_config=types.ImageConfig(
-                            aspect_ratio="1:1",
-                        )
-                    )
-                )
 
-                image_parts = [
-                    part.inline_data.data
-                    for part in response.candidates[0].content.parts
-                    if part.inline_data
-                ]
+def bulk_translate(messages: List[str], region_keys: Optional[List[str]] = None, progress=None) -> dict:
+    """Translate many messages into the top languages of many regions at once.
 
-                if image_parts:
-                    image = Image.open(BytesIO(image_parts[0]))
-                    filename = f"combined_{view_name}_{timestamp}.png"
-                    filepath = combined_dir / filename
-                    image.save(filepath, "PNG")
-                    generated_images.append(str(filepath))
+    Target languages are deduplicated across regions and each language is
+    translated as one batch (all messages through the same translator), with
+    languages running concurrently. Results are merged into TRANSLATIONS_FILE,
+    which get_message_translations reads before making any network call.
 
-            return f"✅ Successfully generated {len(generated_images)} combined product views showing {len(product_slugs)} product(s) together!\n\n**Campaign Folder:** `{campaign_dir}/`\n\nProducts saved to: `{combined_dir}/`", generated_images
+    Returns a summary dict with the languages, translation count and failures.
+    """
+    regions = load_regions_config()
+    region_keys = region_keys or list(regions.keys())
+
+    unknown = [key for key in region_keys if key not in regions]
+    if unknown:
+        raise ValueError(f"Unknown region(s): {', '.join(unknown)}")
+
+    # Deduplicate messages and target languages (English is kept as-is)
+    messages = list(dict.fromkeys(normalize_translation_text(m) for m in messages if m and m.strip()))
+    lang_codes = list(dict.fromkeys(
+        lang.get('code')
+        for key in region_keys
+        for lang in regions[key].get('top_languages', [])
+        if lang.get('code') and lang.get('code') != 'en'
+    ))
 
-    except Exception as e:
-        return f"❌ Error during generation: {str(e)}", generated_images
+    def translate_batch(lang_code: str) -> Tuple[dict, List[str]]:
+        translated, failed = {}, []
+        for message in messages:
+            try:
+                translated[message] = translate_text(message, lang_code)
+            except Exception as e:
+                failed.append(f"{lang_code}: {message[:40]} ({e})")
+        return translated, failed
+
+    # Start from the existing file so repeated bulk runs accumulate
+    output = {message: dict(texts) for message, texts in load_translations_file().items()}
+    failures = []
+    for message in messages:
+        output.setdefault(message, {})['en'] = message
+
+    # Batches run on the translation pool, leaving the generation executor to image tasks
+    executor = get_translation_executor()
+    futures = {executor.submit(translate_batch, lang_code): lang_code for lang_code in lang_codes}
+    for completed, future in enumerate(as_completed(futures), start=1):
+        lang_code = futures[future]
+        try:
+            translated, failed = future.result()
+        except Exception as e:
+            failures.append(f"{lang_code}: {e}")
+        else:
+            for message, text in translated.items():
+                output[message][lang_code] = text
+            failures.extend(failed)
+        if progress:
+            progress(completed / len(futures), desc=f"Translated {lang_code} ({completed}/{len(futures)})...")
+
+    TRANSLATIONS_FILE.parent.mkdir(parents=True, exist_ok=True)
+    with open(TRANSLATIONS_FILE, 'w', encoding='utf-8') as f:
+        json.dump({
+            "generated_at": datetime.now().isoformat(),
+            "regions": {key: [lang.get('code') for lang in regions[key].get('top_languages', [])] for key in region_keys},
+            "messages": output
+        }, f, indent=2, ensure_ascii=False)
+
+    return {
+        "messages": len(messages),
+        "languages": lang_codes,
+        "translations": sum(1 for message in messages for code in lang_codes if code in output[message]),
+        "failures": failures,
+        "output": str(TRANSLATIONS_FILE)
+    }
 
 
 def translate_message(message: str, region_key: str) -> str:
@@ -510,22 +3045,18 @@ def translate_message(message: str, region_key: str) -> str:
     output += f"**Original Message:**\n{message}\n\n---\n\n"
 
     try:
+        # Translate all languages concurrently (English is passed through as-is)
+        results = translate_languages(message, [lang.get('code') for lang in top_languages])
+
         for lang in top_languages:
             lang_code = lang.get('code')
             lang_name = lang.get('name')
+            translated, lang_error = results[lang_code]
 
-            # Skip English if message is already in English (common case)
-            if lang_code == 'en':
-                output += f"**{lang_name}:**\n{message}\n\n"
-                continue
-
-            try:
-                # Translate using GoogleTranslator
-                translator = GoogleTranslator(source='auto', target=lang_code)
-                translated = translator.translate(message)
-                output += f"**{lang_name}:**\n{translated}\n\n"
-            except Exception as lang_error:
+            if lang_error:
                 output += f"**{lang_name}:**\n⚠️ Translation error: {str(lang_error)}\n\n"
+            else:
+                output += f"**{lang_name}:**\n{translated}\n\n"
 
         return output
 
@@ -557,29 +3088,21 @@ def get_message_translations(message: str, region_key: str) -> List[dict]:
     translations = []
 
     try:
+        # Translate all languages concurrently (English uses the original)
+        results = translate_languages(message, [lang.get('code') for lang in top_languages])
+
         for lang in top_languages:
             lang_code = lang.get('code')
             lang_name = lang.get('name')
+            translated, lang_error = results[lang_code]
 
-            # Skip English if message is already in English (use original)
-            if lang_code == 'en':
-                translations.append({
-                    'language': lang_name,
-                    'code': lang_code,
-                    'text': message
-                })
-                continue
-
-            try:
-                # Translate using GoogleTranslator
-                translator = GoogleTranslator(source='auto', target=lang_code)
-                translated = translator.translate(message)
+            if not lang_error:
                 translations.append({
                     'language': lang_name,
                     'code': lang_code,
                     'text': translated
                 })
-            except Exception as lang_error:
+            else:
                 print(f"Warning: Could not translate to {lang_name}: {lang_error}")
                 # Still include the original message if translation fails
                 translations.append({
@@ -655,33 +3178,60 @@ def generate_random_environment() -> str:
     return random.choice(environments)
 
 
-def generate_environments(prompt: str, campaign_id: str, progress=gr.Progress()) -> Tuple[str, List[str]]:
-    """Generate 4 background environment images using Gemini."""
+def generate_environments(prompt: str, campaign_id: str, force_regenerate: bool = False, contact_sheet: Optional[bool] = None, progress=gr.Progress()) -> Iterator[Tuple[str, List[str]]]:
+    """Generate 4 background environment images using Gemini.
+
+    With contact_sheet (default: CONTACT_SHEET_MODE), the four variations are
+    generated as one 2x2 grid image and sliced locally.
+
+    Yields (status, image_paths) after every finished environment.
+    """
     if not prompt or not prompt.strip():
-        return "⚠️ Please enter an environment prompt first", []
+        yield "⚠️ Please enter an environment prompt first", []
+        return
 
     # Check API key
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key or api_key == "your_api_key_here":
-        return "❌ Error: Please configure your API key in Settings tab first", []
+        yield "❌ Error: Please configure your API key in Settings tab first", []
+        return
 
     # Create campaign directory structure (use campaign_id only, no timestamp)
     campaign_dir = Path("outputs") / campaign_id
     outputs_dir = campaign_dir / "environments"
     outputs_dir.mkdir(parents=True, exist_ok=True)
 
-    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
     generated_images = []
 
+    run_id = None
     try:
-        # Initialize Gemini client
-        client = genai.Client(api_key=api_key)
-
-        # Generate 4 environment variations
+        # Get the pooled Gemini client
+        client = get_genai_client(api_key)
+
+        if contact_sheet is None:
+            contact_sheet = CONTACT_SHEET_MODE
+
+        # Start (or resume) this run in the job queue
+        run_id, timestamp = start_job_run(campaign_id, "environments", {"prompt": prompt, "contact_sheet": contact_sheet}, force_regenerate)
+
+        # Contact sheet: all four variations come from one grid image
+        if contact_sheet:
+            columns, rows, sheet_ratio = CONTACT_SHEET_GRIDS["environments"]
+            sheet_prompt = build_contact_sheet_prompt(
+                f"Create professional background environment photographs based on this description: {prompt}",
+                [f"Variation {i + 1}: the same scene with a subtle variation in camera angle or lighting" for i in range(4)],
+                "- Pure photorealistic environment scene\n- No products, no people, just the background setting\n- Professional photography quality with proper lighting and depth\n- Clean, uncluttered composition, perfect for product placement in post-production",
+                columns, rows
+            )
+            sheet_path = outputs_dir / "sheets" / f"sheet_{timestamp}.png"
+            get_sheet = run_once(partial(generate_intermediate_image, client, sheet_prompt, sheet_ratio, sheet_path, force_regenerate))
+
+        # Queue 4 environment variations on the shared executor
+        tasks = []
+        task_steps = []
+        task_labels = []
+        job_entries = []
         for i in range(4):
-            progress((i + 1) / 4, desc=f"Generating environment {i + 1}/4...")
-
             full_prompt = f"""Create a professional background environment photograph based on this description: {prompt}
 
 CRITICAL REQUIREMENTS:
@@ -696,61 +3246,179 @@ CRITICAL REQUIREMENTS:
 
 Variation {i + 1}: Add subtle variation in camera angle or lighting while maintaining the same overall scene."""
 
-            response = client.models.generate_content(
-                model="gemini-2.5-flash-image",
-                contents=full_prompt,
-                config=types.GenerateContentConfig(
-                    response_modalities=["IMAGE"],
-                    image_config=types.ImageConfig(
-                        aspect_ratio="1:1",
-                    )
-                )
-            )
+            filepath = get_output_path(outputs_dir, f"environment_{i+1}_{timestamp}", "environments")
+            task_key = f"environments/{i + 1}"
+            if contact_sheet:
+                generate = partial(render_sheet_tile, get_sheet, columns, rows, i, filepath, "environments")
+            else:
+                generate = partial(generate_and_save_image, client, full_prompt, "1:1", filepath, "environments", force_regenerate)
+            tasks.append(partial(run_job_task, run_id, task_key, filepath, generate))
+            task_steps.append(get_sheet if contact_sheet else None)
+            task_labels.append(f"environment {i + 1}")
+            job_entries.append((task_key, filepath))
 
-            image_parts = [
-                part.inline_data.data
-                for part in response.candidates[0].content.parts
-                if part.inline_data
-            ]
+        register_job_tasks(run_id, job_entries)
 
-            if image_parts:
-                image = Image.open(BytesIO(image_parts[0]))
-                filename = f"environment_{i+1}_{timestamp}.png"
-                filepath = outputs_dir / filename
-                image.save(filepath, "PNG")
-                generated_images.append(str(filepath))
+        # Stream each environment into the gallery as soon as it is ready
+        results = [(None, None)] * len(tasks)
+        for completed, idx, result, error in iter_generation_tasks(tasks, requires=task_steps):
+            results[idx] = (result, error)
+            progress(completed / len(tasks), desc=f"Generated environment {completed}/{len(tasks)}...")
+            generated_images = [path for path, _ in results if path]
+            yield f"⏳ Generating environments... {completed}/{len(tasks)} done", generated_images
 
-        return f"✅ Successfully generated {len(generated_images)} environment backgrounds!\n\n**Campaign Folder:** `{campaign_dir}/`\n\nEnvironments saved to: `{outputs_dir}/`", generated_images
+        errors = format_generation_errors(task_labels, results)
+        sheet_note = f"\n\n🗂️ Contact sheet mode: 1 API call for {len(tasks)} environments (sheet in `sheets/`)" if contact_sheet else ""
+
+        yield f"✅ Successfully generated {len(generated_images)} environment backgrounds!\n\n**Campaign Folder:** `{campaign_dir}/`\n\nEnvironments saved to: `{outputs_dir}/`{sheet_note}{errors}", generated_images
 
     except Exception as e:
-        return f"❌ Error during generation: {str(e)}", generated_images
+        yield f"❌ Error during generation: {str(e)}", generated_images
+    finally:
+        release_job_run(run_id)
+
+
+def build_ad_prompt(format_config: dict, ad_copy: Optional[str], include_logo: bool, reframe: bool = False, logo_corner: Optional[str] = None) -> str:
+    """Build the ad composition prompt for one aspect ratio and message.
+
+    With ad_copy=None the prompt asks for a text-free base creative with the top
+    area kept clear, so the copy can be rendered locally afterwards. With reframe,
+    it asks for a master composition that survives cropping to 9:16 and 16:9.
+    With logo_corner, that corner is kept clear for a logo composited afterwards.
+    """
+
+    # Build reference images list
+    reference_list = "1. Background environment setting (use as the scene/backdrop)\n2. Product photograph (integrate naturally into the scene)"
+    if include_logo:
+        reference_list += "\n3. Company logo (place subtly in corner or appropriate location)"
+
+    # Build logo requirements
+    logo_requirements = ""
+    if include_logo:
+        logo_requirements = """
+LOGO PLACEMENT:
+- Include the company logo in the composition
+- Place logo subtly in a corner or appropriate location
+- Logo should be visible but not overwhelming
+- Maintain logo clarity and branding
+- Typical placement: top-right, top-left, or bottom-right corner
+"""
+
+    # Ad copy and typography (or a clear text area for local rendering)
+    if ad_copy is None:
+        copy_requirements = """
+TEXT:
+- Do NOT include any text, letters, numbers, captions or watermarks in the image
+- Keep the top quarter of the frame calm and uncluttered (sky, wall, soft background) so a headline can be added later
+- Keep the product and key scene elements out of that top area
+"""
+        copy_summary = "Leaves a clean, text-free area at the top for the headline"
+    else:
+        copy_requirements = f"""
+AD COPY TO FEATURE:
+"{ad_copy}"
+
+TYPOGRAPHY & TEXT DESIGN:
+- Place ad copy text prominently but not obscuring the product
+- Text should be clear, readable, and professionally styled
+- Use modern, bold, clean typography appropriate for premium advertising
+- Text placement: typically top or bottom third, avoiding product area
+- Consider visual hierarchy: headline bold and large, body text smaller
+- Text should complement not compete with the product
+- Use colors that contrast well with background for readability
+"""
+        copy_summary = "Includes clear, compelling advertising copy"
+
+    # Room for a logo that is added locally
+    if logo_corner:
+        copy_requirements += f"""
+LOGO AREA:
+- Keep the {logo_corner.replace('-', ' ')} corner calm and free of the product and important details; the brand logo is added there afterwards
+- Do not draw any logo or brand mark yourself
+"""
+
+    # Master render that the other aspect ratios are cropped from
+    if reframe:
+        copy_requirements += """
+COMPOSITION FOR REFRAMING:
+- This image will also be cropped to 9:16 vertical and 16:9 landscape versions
+- Keep the product, the logo and any text inside the central area (the middle 55% of the width and of the height)
+- Extend the environment naturally to every edge, with no borders, frames or vignettes
+"""
+
+    return f"""Create a professional advertising image for {format_config['description']} in {format_config['size']} ({format_config['dimensions']}) format.
+
+REFERENCE IMAGES PROVIDED:
+{reference_list}
+
+CRITICAL COMPOSITION REQUIREMENTS:
+- Aspect ratio: {format_config['size']} ({format_config['dimensions']})
+- Product must be the HERO/FOCAL POINT of the image - prominently featured and clearly visible
+- Position product in the FOREGROUND, taking up 40-60% of the frame
+- Product should be slightly closer to camera than other scene elements for depth and emphasis
+- Use a medium-close composition that highlights product details while showing environment context
+
+PRODUCT INTEGRATION & PERSPECTIVE:
+- Match the product's perspective EXACTLY to the environment's viewing angle and camera position
+- Ensure product orientation aligns naturally with the scene's vanishing point and horizon line
+- The product must appear to physically exist within the 3D space of the environment
+- Maintain consistent scale - product should look realistically sized for its placement
+- If environment has a surface (table, counter, ground), place product ON that surface naturally
+- Product should cast realistic shadows that match the environment's lighting direction
+- Reflections and highlights on product must match the environment's light sources
+
+LIGHTING & VISUAL COHERENCE:
+- Product lighting MUST match environment lighting exactly (color temperature, intensity, direction)
+- Match ambient light color - warm/cool tones should be consistent between product and scene
+- Ensure product's highlights and shadows align with environment's light sources
+- Add subtle environmental reflections on product surfaces when appropriate
+- Professional advertising photography quality with polished, commercial-ready aesthetic
+{logo_requirements}{copy_requirements}
+FINAL OUTPUT REQUIREMENTS:
+A polished, professional advertisement that:
+1. Features the product as the clear hero with prominent placement
+2. Integrates product seamlessly into environment with perfect perspective matching
+3. Shows natural, realistic lighting and shadows throughout
+4. {copy_summary}
+5. Looks like a premium commercial campaign creative ready for publication"""
 
 
-def generate_ad_compositions(selected_envs: List[str], selected_products: List[str], campaign_msg: str, selected_logos: List[str], include_logo_1_1: bool, include_logo_9_16: bool, include_logo_16_9: bool, region_key: str, audience_key: str, localize_1_1: bool, localize_9_16: bool, localize_16_9: bool, campaign_id: str, environment_prompt: str, product_slugs: List[str], generation_mode: str, progress=gr.Progress()) -> Tuple[str, List[str], List[str], List[str], str]:
+def generate_ad_compositions(selected_envs: List[str], selected_products: List[str], campaign_msg: str, selected_logos: List[str], include_logo_1_1: bool, include_logo_9_16: bool, include_logo_16_9: bool, region_key: str, audience_key: str, localize_1_1: bool, localize_9_16: bool, localize_16_9: bool, campaign_id: str, environment_prompt: str, product_slugs: List[str], generation_mode: str, force_regenerate: bool = False, local_text: Optional[bool] = None, reframe: Optional[bool] = None, progress=gr.Progress()) -> Iterator[Tuple[str, List[str], List[str], List[str], str]]:
     """Generate final ad compositions in multiple aspect ratios using AI.
 
     If localization is enabled for a format, generates versions in all regional languages.
     All formats use the campaign message from the Messaging tab.
+
+    With local_text (default: AD_TEXT_OVERLAY), one text-free base is generated per
+    aspect ratio and every message is rendered onto it locally.
+
+    With reframe (default: AD_REFRAME), a single REFRAME_MASTER_RATIO master is
+    generated (per message, or once with local_text) and the other aspect ratios
+    are cropped/padded from it locally.
+
+    Yields (status, ads_1_1, ads_9_16, ads_16_9, config_json) after every finished ad.
     """
 
     if not selected_envs:
-        return "⚠️ Please select at least one environment in the Environments tab", [], [], [], ""
+        yield "⚠️ Please select at least one environment in the Environments tab", [], [], [], ""
+        return
 
     if not selected_products:
-        return "⚠️ Please select at least one product view in the Products tab", [], [], [], ""
+        yield "⚠️ Please select at least one product view in the Products tab", [], [], [], ""
+        return
 
     # Check API key
     api_key = os.getenv("GOOGLE_API_KEY")
     if not api_key or api_key == "your_api_key_here":
-        return "❌ Error: Please configure your API key in Settings tab first", [], [], [], ""
+        yield "❌ Error: Please configure your API key in Settings tab first", [], [], [], ""
+        return
 
+    run_id = None
     try:
         # Use provided campaign ID for folder naming (no timestamp)
         campaign_dir = Path("outputs") / campaign_id
         campaign_dir.mkdir(parents=True, exist_ok=True)
 
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-
         # Create subdirectories for organized content
         environments_dir = campaign_dir / "environments"
         products_dir = campaign_dir / "products"
@@ -758,7 +3426,7 @@ def generate_ad_compositions(selected_envs: List[str], selected_products: List[s
 
         environments_dir.mkdir(parents=True, exist_ok=True)
         products_dir.mkdir(parents=True, exist_ok=True)
-        # Note: ads subdirectories will be created when images are saved
+        # Note: ads subdirectories are created as the ad tasks are scheduled
 
         # Load first environment and product (using first selected)
         env_path = selected_envs[0]
@@ -766,28 +3434,64 @@ def generate_ad_compositions(selected_envs: List[str], selected_products: List[s
 
         progress(0.1, desc="Loading reference images...")
 
-        # Load reference images
-        env_img = Image.open(env_path)
-        product_img = Image.open(product_path)
+        # Encode reference images once into request parts shared by every call in the ad matrix
+        env_img = prepare_reference_image(env_path)
+        product_img = prepare_reference_image(product_path)
 
         # Copy ALL selected environment and product images to campaign folder
+        # (skipping assets that were generated into this campaign folder already)
         import shutil
         for env in selected_envs:
             env_dest = environments_dir / Path(env).name
-            shutil.copy2(env, env_dest)
+            if not env_dest.exists() or not env_dest.samefile(env):
+                shutil.copy2(env, env_dest)
 
         for prod in selected_products:
             product_dest = products_dir / Path(prod).name
-            shutil.copy2(prod, product_dest)
+            if not product_dest.exists() or not product_dest.samefile(prod):
+                shutil.copy2(prod, product_dest)
 
-        # Load logo if available
+        # Load logo if available: prepared once and composited locally (AD_LOGO_OVERLAY),
+        # or sent to the model as a reference image
         logo_img = None
+        prepared_logo = None
         if selected_logos and len(selected_logos) > 0:
             logo_path = selected_logos[0]
-            logo_img = Image.open(logo_path)
-
-        # Initialize Gemini client
-        client = genai.Client(api_key=api_key)
+            if AD_LOGO_OVERLAY:
+                prepared_logo = get_prepared_logo(logo_path)
+            else:
+                logo_img = prepare_reference_image(logo_path)
+
+        # Get the pooled Gemini client
+        client = get_genai_client(api_key)
+        upload_meter = new_upload_meter()
+
+        if local_text is None:
+            local_text = AD_TEXT_OVERLAY
+        if reframe is None:
+            reframe = AD_REFRAME
+
+        # Start (or resume) this run in the job queue, referencing the campaign-folder copies
+        job_params = {
+            "selected_envs": [str(environments_dir / Path(env).name) for env in selected_envs],
+            "selected_products": [str(products_dir / Path(prod).name) for prod in selected_products],
+            "campaign_msg": campaign_msg,
+            "selected_logos": selected_logos or [],
+            "include_logo_1_1": include_logo_1_1,
+            "include_logo_9_16": include_logo_9_16,
+            "include_logo_16_9": include_logo_16_9,
+            "region_key": region_key,
+            "audience_key": audience_key,
+            "localize_1_1": localize_1_1,
+            "localize_9_16": localize_9_16,
+            "localize_16_9": localize_16_9,
+            "environment_prompt": environment_prompt,
+            "product_slugs": product_slugs or [],
+            "generation_mode": generation_mode,
+            "local_text": local_text,
+            "reframe": reframe
+        }
+        run_id, timestamp = start_job_run(campaign_id, "ads", job_params, force_regenerate)
 
         # Define aspect ratios with descriptive names and API aspect ratio values
         aspect_ratios = {
@@ -904,9 +3608,11 @@ def generate_ad_compositions(selected_envs: List[str], selected_products: List[s
         # Check if localization is needed for actual generation
         if localize_1_1 or localize_9_16 or localize_16_9:
             if not region_key:
-                return "⚠️ Please select a region in Campaign tab to use localization feature.", [], [], [], json.dumps(campaign_config, indent=2, ensure_ascii=False)
+                yield "⚠️ Please select a region in Campaign tab to use localization feature.", [], [], [], json.dumps(campaign_config, indent=2, ensure_ascii=False)
+                return
             if not translations_list:
-                return "⚠️ Could not get translations. Please select a region in Campaign tab or disable localization.", [], [], [], json.dumps(campaign_config, indent=2, ensure_ascii=False)
+                yield "⚠️ Could not get translations. Please select a region in Campaign tab or disable localization.", [], [], [], json.dumps(campaign_config, indent=2, ensure_ascii=False)
+                return
 
         outputs = {
             "1_1": [],
@@ -914,18 +3620,28 @@ def generate_ad_compositions(selected_envs: List[str], selected_products: List[s
             "16_9": []
         }
 
-        total_generations = 0
-        for config in aspect_ratios.values():
-            if config['localize'] and translations_list:
-                total_generations += len(translations_list)
-            else:
-                total_generations += 1
-
-        generation_count = 0
-
-        for idx, (name, config) in enumerate(aspect_ratios.items()):
-            # Check if logo should be included for this format
+        # Expand the aspect ratio x language matrix into a flat task list
+        tasks = []
+        task_steps = []
+        task_labels = []
+        task_formats = []
+        job_entries = []
+
+        # Reframe: master renders (one per message, or one text-free master) shared by all ratios,
+        # each scheduled as a step before the bases and variants derived from it
+        masters = {}
+        master_config = next(c for c in aspect_ratios.values() if c["aspect_ratio"] == REFRAME_MASTER_RATIO)
+        master_logo = logo_img is not None and any(c["include_logo"] for c in aspect_ratios.values())
+        master_contents = [env_img, product_img] + ([logo_img] if master_logo else [])
+        if reframe and local_text:
+            master_path = ads_dir / "master" / f"master_{timestamp}.png"
+            masters[None] = run_once(partial(generate_intermediate_image, client, [build_ad_prompt(master_config, None, master_logo, reframe=True)] + master_contents, REFRAME_MASTER_RATIO, master_path, force_regenerate, upload_meter))
+
+        for name, config in aspect_ratios.items():
+            # Check if logo should be included for this format (by the model, or locally)
             should_include_logo = config['include_logo'] and logo_img is not None
+            ratio_logo = prepared_logo if config['include_logo'] else None
+            logo_corner = get_logo_corner() if ratio_logo else None
 
             # Determine messages to generate
             messages_to_generate = []
@@ -946,123 +3662,74 @@ def generate_ad_compositions(selected_envs: List[str], selected_products: List[s
                     'code': 'original'
                 })
 
-            # Generate ad for each message
-            for msg_idx, msg_data in enumerate(messages_to_generate):
-                generation_count += 1
+            # Local text: all messages of this ratio share one text-free base creative,
+            # scheduled as its own step before the renders that read it
+            if local_text:
+                base_path = ads_dir / name / "base" / f"base_{timestamp}.png"
+                if reframe and config["aspect_ratio"] == REFRAME_MASTER_RATIO:
+                    get_base = masters[None]
+                elif reframe:
+                    get_base = run_once(partial(derive_ad_base, masters[None], config["aspect_ratio"], base_path), requires=masters[None])
+                else:
+                    contents = [build_ad_prompt(config, None, should_include_logo, logo_corner=logo_corner), env_img, product_img]
+                    if should_include_logo:
+                        contents.append(logo_img)
+                    get_base = run_once(partial(generate_intermediate_image, client, contents, config["aspect_ratio"], base_path, force_regenerate, upload_meter))
+
+            for msg_data in messages_to_generate:
+                if reframe and not local_text and msg_data['code'] not in masters:
+                    master_path = ads_dir / "master" / f"master_{msg_data['code']}_{timestamp}.png"
+                    contents = [build_ad_prompt(master_config, msg_data['text'], master_logo, reframe=True)] + master_contents
+                    masters[msg_data['code']] = run_once(partial(generate_intermediate_image, client, contents, REFRAME_MASTER_RATIO, master_path, force_regenerate, upload_meter))
+                elif not local_text and not reframe:
+                    prompt = build_ad_prompt(config, msg_data['text'], should_include_logo, logo_corner=logo_corner)
+
+                    # Prepare content with reference images
+                    contents = [prompt, env_img, product_img]
+                    if should_include_logo:
+                        contents.append(logo_img)
+
+                # Deterministic output path: ads/[ratio]/[lang]/ad_[lang]_[timestamp].[ext]
+                lang_code = msg_data['code'] if msg_data['code'] != 'original' else 'en'
+                lang_dir = ads_dir / name / lang_code
+                lang_dir.mkdir(parents=True, exist_ok=True)
+                filepath = get_output_path(lang_dir, f"ad_{lang_code}_{timestamp}", "ads")
+
+                task_key = f"ads/{name}/{lang_code}"
+                step = None
+                if local_text:
+                    generate = partial(render_ad_variant, get_base, msg_data['text'], filepath, ratio_logo)
+                    step = get_base
+                elif reframe:
+                    generate = partial(render_reframed_variant, masters[msg_data['code']], config["aspect_ratio"], filepath, ratio_logo)
+                    step = masters[msg_data['code']]
+                elif ratio_logo:
+                    generate = partial(generate_and_save_ad, client, contents, config["aspect_ratio"], filepath, force_regenerate, ratio_logo, upload_meter)
+                else:
+                    generate = partial(generate_and_save_image, client, contents, config["aspect_ratio"], filepath, "ads", force_regenerate, upload_meter)
+                tasks.append(partial(run_job_task, run_id, task_key, filepath, generate))
+                task_steps.append(step)
+                job_entries.append((task_key, filepath))
                 lang_desc = f" ({msg_data['language']})" if msg_data['language'] != 'original' else ""
-                progress(generation_count / total_generations, desc=f"Generating {config['size']} ad{lang_desc}...")
-
-                ad_copy = msg_data['text']
+                task_labels.append(f"{config['size']} ad{lang_desc}")
+                task_formats.append(name)
 
-                # Build reference images list
-                reference_list = "1. Background environment setting (use as the scene/backdrop)\n2. Product photograph (integrate naturally into the scene)"
-                if should_include_logo:
-                    reference_list += "\n3. Company logo (place subtly in corner or appropriate location)"
+        register_job_tasks(run_id, job_entries)
 
-                # Build logo requirements
-                logo_requirements = ""
-                if should_include_logo:
-                    logo_requirements = """
-LOGO PLACEMENT:
-- Include the company logo in the composition
-- Place logo subtly in a corner or appropriate location
-- Logo should be visible but not overwhelming
-- Maintain logo clarity and branding
-- Typical placement: top-right, top-left, or bottom-right corner
-"""
-
-                prompt = f"""Create a professional advertising image for {config['description']} in {config['size']} ({config['dimensions']}) format.
-
-REFERENCE IMAGES PROVIDED:
-{reference_list}
-
-CRITICAL COMPOSITION REQUIREMENTS:
-- Aspect ratio: {config['size']} ({config['dimensions']})
-- Product must be the HERO/FOCAL POINT of the image - prominently featured and clearly visible
-- Position product in the FOREGROUND, taking up 40-60% of the frame
-- Product should be slightly closer to camera than other scene elements for depth and emphasis
-- Use a medium-close composition that highlights product details while showing environment context
-
-PRODUCT INTEGRATION & PERSPECTIVE:
-- Match the product's perspective EXACTLY to the environment's viewing angle and camera position
-- Ensure product orientation aligns naturally with the scene's vanishing point and horizon line
-- The product must appear to physically exist within the 3D space of the environment
-- Maintain consistent scale - product should look realistically sized for its placement
-- If environment has a surface (table, counter, ground), place product ON that surface naturally
-- Product should cast realistic shadows that match the environment's lighting direction
-- Reflections and highlights on product must match the environment's light sources
-
-LIGHTING & VISUAL COHERENCE:
-- Product lighting MUST match environment lighting exactly (color temperature, intensity, direction)
-- Match ambient light color - warm/cool tones should be consistent between product and scene
-- Ensure product's highlights and shadows align with environment's light sources
-- Add subtle environmental reflections on product surfaces when appropriate
-- Professional advertising photography quality with polished, commercial-ready aesthetic
-{logo_requirements}
-AD COPY TO FEATURE:
-"{ad_copy}"
-
-TYPOGRAPHY & TEXT DESIGN:
-- Place ad copy text prominently but not obscuring the product
-- Text should be clear, readable, and professionally styled
-- Use modern, bold, clean typography appropriate for premium advertising
-- Text placement: typically top or bottom third, avoiding product area
-- Consider visual hierarchy: headline bold and large, body text smaller
-- Text should complement not compete with the product
-- Use colors that contrast well with background for readability
-
-FINAL OUTPUT REQUIREMENTS:
-A polished, professional advertisement that:
-1. Features the product as the clear hero with prominent placement
-2. Integrates product seamlessly into environment with perfect perspective matching
-3. Shows natural, realistic lighting and shadows throughout
-4. Includes clear, compelling advertising copy
-5. Looks like a premium commercial campaign creative ready for publication"""
+        # Stream each ad into its preview gallery as soon as it is ready
+        json_str = json.dumps(campaign_config, indent=2, ensure_ascii=False)
+        results = [(None, None)] * len(tasks)
+        for completed, idx, result, error in iter_generation_tasks(tasks, max_parallel=MAX_PARALLEL_AD_GENERATIONS, requires=task_steps):
+            results[idx] = (result, error)
+            progress(completed / len(tasks), desc=f"Generated {task_labels[idx]} ({completed}/{len(tasks)})...")
 
-                # Prepare content with reference images
-                contents = [prompt, env_img, product_img]
-                if should_include_logo:
-                    contents.append(logo_img)
-
-                # Generate with specific aspect ratio configuration
-                response = client.models.generate_content(
-                    model="gemini-2.5-flash-image",
-                    contents=contents,
-                    config=types.GenerateContentConfig(
-                        response_modalities=["IMAGE"],
-                        image_config=types.ImageConfig(
-                            aspect_ratio=config["aspect_ratio"],
-                        )
-                    )
-                )
+            # Collect outputs in matrix order regardless of completion order
+            outputs = {name: [] for name in aspect_ratios}
+            for name, (path, _) in zip(task_formats, results):
+                if path:
+                    outputs[name].append(path)
 
-                # Extract generated image with error handling
-                image_parts = []
-                if response and response.candidates and len(response.candidates) > 0:
-                    candidate = response.candidates[0]
-                    if candidate.content and candidate.content.parts:
-                        image_parts = [
-                            part.inline_data.data
-                            for part in candidate.content.parts
-                            if part.inline_data
-                        ]
-
-                if image_parts:
-                    generated_img = Image.open(BytesIO(image_parts[0]))
-
-                    # Save to organized structure: ads/[ratio]/[lang]/
-                    ratio_dir = ads_dir / name
-                    lang_code = msg_data['code'] if msg_data['code'] != 'original' else 'en'
-                    lang_dir = ratio_dir / lang_code
-                    lang_dir.mkdir(parents=True, exist_ok=True)
-
-                    # Create filename with timestamp
-                    file_timestamp = datetime.now().strftime("%Y%m%d_%H%M%S_%f")[:-3]
-                    filename = f"ad_{lang_code}_{file_timestamp}.png"
-                    filepath = lang_dir / filename
-
-                    generated_img.save(filepath, "PNG")
-                    outputs[name].append(str(filepath))
+            yield f"⏳ Generating ads... {completed}/{len(tasks)} done", outputs["1_1"], outputs["9_16"], outputs["16_9"], json_str
 
         progress(1.0, desc="Complete!")
 
@@ -1079,18 +3746,30 @@ A polished, professional advertisement that:
                 localized = len(images) > 1
                 status_parts.append(f"- {format_name.replace('_', ':')}: {len(images)} image(s)" + (" (localized)" if localized else ""))
 
+        if reframe:
+            status_parts.append(f"\n🖼️ Formats derived locally from {len(masters)} {REFRAME_MASTER_RATIO} master render(s) (`ads/master/`)")
+        if local_text:
+            status_parts.append("\n🖋️ Ad copy rendered locally on one base image per format (`ads/<ratio>/base/`)")
+        if prepared_logo and any(config['include_logo'] for config in aspect_ratios.values()):
+            status_parts.append(f"\n🏷️ Logo composited locally in the {get_logo_corner()} corner (not sent to the model)")
+        elif AD_LOGO_OVERLAY and selected_logos and any(config['include_logo'] for config in aspect_ratios.values()):
+            status_parts.append(f"\n⚠️ Logo could not be read and was left out: `{selected_logos[0]}`")
+
+        reference_kb = get_request_size([part for part in (env_img, product_img, logo_img) if part]) / 1024
+        status_parts.append(f"\n📤 Uploaded {upload_meter['bytes'] / (1024 * 1024):.2f} MB in {upload_meter['requests']} API request(s) "
+                            f"(reference images encoded once: {reference_kb:.0f} KB per request)")
+
         status_parts.append(f"\n**Saved to:** `{campaign_dir}/`")
         status_parts.append(f"\n📁 Organized by aspect ratio and language")
         status_parts.append(f"📄 Complete JSON configuration saved")
-        status = "\n".join(status_parts)
-
-        # Format JSON for display
-        json_str = json.dumps(campaign_config, indent=2, ensure_ascii=False)
+        status = "\n".join(status_parts) + format_generation_errors(task_labels, results)
 
-        return status, outputs.get("1_1", []), outputs.get("9_16", []), outputs.get("16_9", []), json_str
+        yield status, outputs.get("1_1", []), outputs.get("9_16", []), outputs.get("16_9", []), json_str
 
     except Exception as e:
-        return f"❌ Error generating ads: {str(e)}", [], [], [], ""
+        yield f"❌ Error generating ads: {str(e)}", [], [], [], ""
+    finally:
+        release_job_run(run_id)
 
 
 # ============================================================================
@@ -1325,7 +4004,7 @@ def export_campaign_config(region_key: str, audience_key: str, message: str, sel
             "key": region_key,
             "name": region.get("name", ""),
             "description": region.get("description", ""),
-            "top_languages": region.get("top_languages", [])
+            "top_languages": thaw_config(region.get("top_languages", []))
         }
 
     # Load and add audience details
@@ -1336,9 +4015,9 @@ def export_campaign_config(region_key: str, audience_key: str, message: str, sel
             "key": audience_key,
             "name": audience.get("name", ""),
             "age_range": audience.get("age_range", ""),
-            "demographics": audience.get("demographics", []),
-            "psychographics": audience.get("psychographics", []),
-            "messaging_preferences": audience.get("messaging_preferences", [])
+            "demographics": thaw_config(audience.get("demographics", [])),
+            "psychographics": thaw_config(audience.get("psychographics", [])),
+            "messaging_preferences": thaw_config(audience.get("messaging_preferences", []))
         }
 
     # Generate filename
@@ -1356,6 +4035,109 @@ def export_campaign_config(region_key: str, audience_key: str, message: str, sel
         return f"Error: {str(e)}"
 
 
+# ============================================================================
+# Headless Batch Runner
+# ============================================================================
+
+def no_progress(*args, **kwargs):
+    """Progress callback used when running without the Gradio UI."""
+    pass
+
+
+def run_campaign_headless(json_path: str, campaign_id: Optional[str] = None, force_regenerate: bool = False) -> dict:
+    """Run a campaign_config.json end to end (environments, product views, ads) without Gradio.
+
+    Uses the first generated environment and product view as ad references,
+    mirroring the manual workflow's default selection.
+
+    Returns:
+        Machine-readable summary dict for the run
+    """
+    started = time.monotonic()
+    summary = {
+        "config": str(json_path),
+        "campaign_id": None,
+        "output_dir": None,
+        "success": False,
+        "environments": [],
+        "product_views": [],
+        "ads": {"1_1": [], "9_16": [], "16_9": []},
+        "messages": [],
+        "duration_seconds": 0.0
+    }
+
+    def log(message):
+        print(f"[{Path(json_path).name}] {message}", file=sys.stderr)
+
+    (region_key, audience_key, message, environment_prompt, product_slugs,
+     generation_mode, logos, localization_settings,
+     logo_settings, new_campaign_id, status) = load_campaign_config_from_json(json_path)
+
+    summary["messages"].append(status)
+    if status.startswith("❌"):
+        summary["duration_seconds"] = round(time.monotonic() - started, 2)
+        return summary
+
+    campaign_id = campaign_id or new_campaign_id
+    summary["campaign_id"] = campaign_id
+    summary["output_dir"] = str(Path("outputs") / campaign_id)
+
+    log(f"Campaign {campaign_id}: generating environments...")
+    env_status, environments = collect_final_result(generate_environments(environment_prompt, campaign_id, force_regenerate, progress=no_progress))
+    summary["messages"].append(env_status)
+    summary["environments"] = environments
+
+    log(f"Campaign {campaign_id}: generating product views...")
+    product_status, product_views = collect_final_result(generate_product_views(product_slugs, generation_mode, campaign_id, force_regenerate, progress=no_progress))
+    summary["messages"].append(product_status)
+    summary["product_views"] = product_views
+
+    if environments and product_views:
+        log(f"Campaign {campaign_id}: generating ads...")
+        ads_status, ads_1_1, ads_9_16, ads_16_9, _ = collect_final_result(generate_ad_compositions(
+            environments[:1], product_views[:1], message, logos,
+            logo_settings[0], logo_settings[1], logo_settings[2],
+            region_key, audience_key,
+            localization_settings[0], localization_settings[1], localization_settings[2],
+            campaign_id, environment_prompt, product_slugs, generation_mode,
+            force_regenerate, progress=no_progress
+        ))
+        summary["messages"].append(ads_status)
+        summary["ads"] = {"1_1": ads_1_1, "9_16": ads_9_16, "16_9": ads_16_9}
+        summary["success"] = ads_status.startswith("✅") and any(summary["ads"].values())
+
+    summary["duration_seconds"] = round(time.monotonic() - started, 2)
+    log(f"Campaign {campaign_id}: {'done' if summary['success'] else 'failed'} in {summary['duration_seconds']}s")
+    return summary
+
+
+def run_campaigns_headless(json_paths: List[str], jobs: int = 1, force_regenerate: bool = False) -> dict:
+    """Run several campaign configs, processing up to `jobs` campaigns in parallel.
+
+    Campaigns run on their own pool; their generation calls still share the
+    global generation executor and rate limiter.
+    """
+    base_id = generate_campaign_id()
+
+    def run_one(idx, json_path):
+        # Suffix IDs so campaigns started in the same second get separate folders
+        campaign_id = base_id if len(json_paths) == 1 else f"{base_id}_{idx + 1:02d}"
+        try:
+            return run_campaign_headless(json_path, campaign_id, force_regenerate)
+        except Exception as e:
+            return {"config": str(json_path), "campaign_id": campaign_id, "success": False, "messages": [f"❌ {str(e)}"]}
+
+    with ThreadPoolExecutor(max_workers=max(1, jobs), thread_name_prefix="campaign") as executor:
+        campaigns = list(executor.map(run_one, range(len(json_paths)), json_paths))
+
+    return {
+        "total": len(campaigns),
+        "succeeded": sum(1 for campaign in campaigns if campaign.get("success")),
+        "failed": sum(1 for campaign in campaigns if not campaign.get("success")),
+        "campaigns": campaigns
+    }
+
+
 def create_interface():
     """Create the Gradio interface."""
 
@@ -1710,12 +4492,8 @@ def create_interface():
                     selected_env_display = gr.Markdown("**Selected:** None")
                     clear_env_selection_btn = gr.Button("Clear Selection", size="sm", variant="secondary")
 
-                # Generate environments handler
-                generate_env_btn.click(
-                    fn=generate_environments,
-                    inputs=[environment_prompt, campaign_id_state],
-                    outputs=[environment_status, environment_gallery]
-                )
+                # Generate environments handler is wired after the Settings tab
+                # (it reads the force regenerate option defined there)
 
                 # Randomize prompt handler
                 randomize_env_btn.click(
@@ -1729,6 +4507,7 @@ def create_interface():
                     """Handle environment image selection."""
                     if evt.value:
                         image_path = evt.value['image']['path'] if isinstance(evt.value, dict) else evt.value
+                        image_path = resolve_thumbnail(image_path)
 
                         # Toggle selection
                         if image_path in selected_list:
@@ -1741,8 +4520,8 @@ def create_interface():
                         else:
                             display = "**Selected:** None"
 
-                        return selected_list, selected_list, display
-                    return selected_list, selected_list, "**Selected:** None"
+                        return selected_list, to_thumbnails(selected_list), display
+                    return selected_list, to_thumbnails(selected_list), "**Selected:** None"
 
                 def clear_env_selection():
                     """Clear environment selection."""
@@ -1844,18 +4623,15 @@ def create_interface():
                     selected_product_display = gr.Markdown("**Selected:** None")
                     clear_product_selection_btn = gr.Button("Clear Selection", size="sm", variant="secondary")
 
-                # Generate button handler
-                generate_btn.click(
-                    fn=generate_product_views,
-                    inputs=[product_dropdown, generation_mode, campaign_id_state],
-                    outputs=[generation_status, generated_gallery]
-                )
+                # Generate button handler is wired after the Settings tab
+                # (it reads the force regenerate option defined there)
 
                 # Selection handlers
                 def select_product_image(evt: gr.SelectData, selected_list):
                     """Handle product image selection."""
                     if evt.value:
                         image_path = evt.value['image']['path'] if isinstance(evt.value, dict) else evt.value
+                        image_path = resolve_thumbnail(image_path)
 
                         # Toggle selection
                         if image_path in selected_list:
@@ -1868,8 +4644,8 @@ def create_interface():
                         else:
                             display = "**Selected:** None"
 
-                        return selected_list, selected_list, display
-                    return selected_list, selected_list, "**Selected:** None"
+                        return selected_list, to_thumbnails(selected_list), display
+                    return selected_list, to_thumbnails(selected_list), "**Selected:** None"
 
                 def clear_product_selection():
                     """Clear product image selection."""
@@ -1940,7 +4716,7 @@ def create_interface():
 
                 # Event handler for logo product selection
                 logo_product_dropdown.change(
-                    fn=lambda slugs: load_product(slugs)[1],
+                    fn=lambda slugs: to_thumbnails(load_product(slugs)[1]),
                     inputs=[logo_product_dropdown],
                     outputs=[logo_gallery]
                 )
@@ -1950,6 +4726,7 @@ def create_interface():
                     """Handle logo selection."""
                     if evt.value:
                         image_path = evt.value['image']['path'] if isinstance(evt.value, dict) else evt.value
+                        image_path = resolve_thumbnail(image_path)
 
                         # Toggle selection
                         if image_path in selected_list:
@@ -1962,8 +4739,8 @@ def create_interface():
                         else:
                             display = "**Selected:** None"
 
-                        return selected_list, selected_list, display
-                    return selected_list, selected_list, "**Selected:** None"
+                        return selected_list, to_thumbnails(selected_list), display
+                    return selected_list, to_thumbnails(selected_list), "**Selected:** None"
 
                 def clear_logo_selection():
                     """Clear logo selection."""
@@ -1992,7 +4769,7 @@ def create_interface():
             def sync_product_selection(slugs):
                 """Load product photos and sync logo tab with same selection."""
                 photos, logos = load_product(slugs)
-                return photos, slugs, logos
+                return to_thumbnails(photos), slugs, to_thumbnails(logos)
 
             product_dropdown.change(
                 fn=sync_product_selection,
@@ -2117,7 +4894,7 @@ def create_interface():
                     # Logo count
                     logo_count = f"**{len(selected_logos)} logo(s) selected**" if selected_logos else "*No logos selected*"
 
-                    return campaign_summary, message_display, translations_display, selected_envs, env_count, selected_products, product_count, selected_logos, logo_count
+                    return campaign_summary, message_display, translations_display, to_thumbnails(selected_envs), env_count, to_thumbnails(selected_products), product_count, to_thumbnails(selected_logos), logo_count
 
                 # Connect refresh button
                 refresh_preview_btn.click(
@@ -2139,9 +4916,34 @@ def create_interface():
                 # Dynamic campaign preview
                 generate_campaign_preview = gr.Markdown("Loading campaign details...")
 
+                local_text_overlay = gr.Checkbox(
+                    label="Render ad copy locally",
+                    value=AD_TEXT_OVERLAY,
+                    interactive=True,
+                    info="Generate one text-free AI image per format and draw each message (and translation) on it locally"
+                )
+                reframe_formats = gr.Checkbox(
+                    label="Derive 9:16 and 16:9 from the 1:1 render",
+                    value=AD_REFRAME,
+                    interactive=True,
+                    info="Generate one square master and crop/pad the other formats locally around the product"
+                )
+
                 with gr.Row():
+                    instant_preview_btn = gr.Button("⚡ Instant Local Preview", variant="secondary", size="lg")
                     generate_ads_btn = gr.Button("🚀 Generate All Ad Formats", variant="primary", size="lg")
 
+                instant_preview_status = gr.Markdown("")
+                instant_preview_gallery = gr.Gallery(
+                    label="Local Preview (no API calls)",
+                    show_label=True,
+                    columns=3,
+                    rows=1,
+                    height=360,
+                    object_fit="contain",
+                    interactive=False
+                )
+
                 generation_status_ads = gr.Markdown("")
 
                 gr.Markdown("---")
@@ -2244,13 +5046,15 @@ def create_interface():
                     lines=20
                 )
 
-                # Connect generation button
-                generate_ads_btn.click(
-                    fn=generate_ad_compositions,
-                    inputs=[selected_env_state, selected_product_state, campaign_message, selected_logo_state, include_logo_1_1, include_logo_9_16, include_logo_16_9, region_dropdown, audience_dropdown, generate_localizations_1_1, generate_localizations_9_16, generate_localizations_16_9, campaign_id_state, environment_prompt, product_dropdown, generation_mode],
-                    outputs=[generation_status_ads, preview_1_1, preview_9_16, preview_16_9, campaign_json_display]
+                instant_preview_btn.click(
+                    fn=render_instant_preview,
+                    inputs=[selected_env_state, selected_product_state, campaign_message, selected_logo_state, include_logo_1_1, include_logo_9_16, include_logo_16_9],
+                    outputs=[instant_preview_status, instant_preview_gallery]
                 )
 
+                # Generation button handler is wired after the Settings tab
+                # (it reads the force regenerate option defined there)
+
                 # Navigation
                 gr.Markdown("---")
                 with gr.Row():
@@ -2294,12 +5098,91 @@ def create_interface():
                     outputs=[api_status]
                 )
 
+                gr.Markdown("---")
+                gr.Markdown("## Generation Performance")
+                gr.Markdown("Identical generation requests (same prompt, reference images, model and aspect ratio) are served from a local cache instead of calling the API again.")
+
+                force_regenerate = gr.Checkbox(
+                    label="Force regenerate",
+                    value=False,
+                    interactive=True,
+                    info="Bypass the cache and always call the API (fresh results replace cached ones)"
+                )
+
+                contact_sheet_mode = gr.Checkbox(
+                    label="Contact sheet mode",
+                    value=CONTACT_SHEET_MODE,
+                    interactive=True,
+                    info="Generate the 6 product views (3x2) and 4 environments (2x2) as one grid image each and slice it locally: fewer API calls, slightly lower detail"
+                )
+
+                cache_stats_display = gr.Markdown(value=format_generation_stats())
+
+                with gr.Row():
+                    refresh_cache_stats_btn = gr.Button("🔄 Refresh Stats", variant="secondary", size="sm")
+                    clear_cache_btn = gr.Button("🗑️ Clear Cache", variant="secondary", size="sm")
+
+                refresh_cache_stats_btn.click(
+                    fn=format_generation_stats,
+                    inputs=[],
+                    outputs=[cache_stats_display]
+                )
+
+                clear_cache_btn.click(
+                    fn=lambda: clear_generation_cache() + "\n\n" + format_generation_stats(),
+                    inputs=[],
+                    outputs=[cache_stats_display]
+                )
+
+                gr.Markdown("---")
+                gr.Markdown("## Unfinished Jobs")
+                gr.Markdown("Generation runs interrupted before finishing (e.g. by a server restart). Resuming generates only the missing images; files already written are kept.")
+
+                unfinished_jobs_display = gr.Markdown(value=format_unfinished_jobs())
+
+                with gr.Row():
+                    refresh_jobs_btn = gr.Button("🔄 Refresh", variant="secondary", size="sm")
+                    resume_jobs_btn = gr.Button("▶️ Resume Unfinished Jobs", variant="primary", size="sm")
+
+                resume_status = gr.Markdown("")
+
+                refresh_jobs_btn.click(
+                    fn=format_unfinished_jobs,
+                    inputs=[],
+                    outputs=[unfinished_jobs_display]
+                )
+
+                resume_jobs_btn.click(
+                    fn=lambda: (resume_job_runs(), format_unfinished_jobs()),
+                    inputs=[],
+                    outputs=[resume_status, unfinished_jobs_display]
+                )
+
                 # Navigation
                 gr.Markdown("---")
                 with gr.Row():
                     prev_to_generate = gr.Button("← Previous: Generate", variant="secondary", size="lg")
                     gr.Markdown("")  # Spacer
 
+        # Wire up generation handlers (after Settings so the force regenerate option exists)
+        generate_env_btn.click(
+            fn=with_thumbnails(generate_environments, 1),
+            inputs=[environment_prompt, campaign_id_state, force_regenerate, contact_sheet_mode],
+            outputs=[environment_status, environment_gallery]
+        )
+
+        generate_btn.click(
+            fn=with_thumbnails(generate_product_views, 1),
+            inputs=[product_dropdown, generation_mode, campaign_id_state, force_regenerate, contact_sheet_mode],
+            outputs=[generation_status, generated_gallery]
+        )
+
+        generate_ads_btn.click(
+            fn=generate_ad_compositions,
+            inputs=[selected_env_state, selected_product_state, campaign_message, selected_logo_state, include_logo_1_1, include_logo_9_16, include_logo_16_9, region_dropdown, audience_dropdown, generate_localizations_1_1, generate_localizations_9_16, generate_localizations_16_9, campaign_id_state, environment_prompt, product_dropdown, generation_mode, force_regenerate, local_text_overlay, reframe_formats],
+            outputs=[generation_status_ads, preview_1_1, preview_9_16, preview_16_9, campaign_json_display]
+        )
+
         # Wire up navigation buttons to switch tabs
         next_to_messaging.click(fn=lambda: gr.update(selected="messaging"), inputs=None, outputs=tabs)
         prev_to_campaign.click(fn=lambda: gr.update(selected="campaign"), inputs=None, outputs=tabs)
@@ -2414,12 +5297,12 @@ def create_interface():
             inputs=[campaign_message, region_dropdown],
             outputs=[translations_output]
         ).then(
-            fn=generate_environments,
-            inputs=[environment_prompt, campaign_id_state],
+            fn=with_thumbnails(generate_environments, 1),
+            inputs=[environment_prompt, campaign_id_state, force_regenerate, contact_sheet_mode],
             outputs=[environment_status, environment_gallery]
         ).then(
-            fn=generate_product_views,
-            inputs=[product_dropdown, generation_mode, campaign_id_state],
+            fn=with_thumbnails(generate_product_views, 1),
+            inputs=[product_dropdown, generation_mode, campaign_id_state, force_regenerate, contact_sheet_mode],
             outputs=[generation_status, generated_gallery]
         ).then(
             fn=lambda: gr.update(selected="preview"),
@@ -2454,8 +5337,73 @@ def create_interface():
     return app
 
 
+def main(argv: Optional[List[str]] = None) -> int:
+    """Command line entry point: launch the UI (default), run campaigns headless or bulk-translate."""
+    parser = argparse.ArgumentParser(description="Creative Automation Pipeline")
+    subparsers = parser.add_subparsers(dest="command")
+
+    subparsers.add_parser("serve", help="Launch the Gradio interface (default)")
+
+    run_parser = subparsers.add_parser("run", help="Run campaign_config.json files end to end without the UI")
+    run_parser.add_argument("configs", nargs="+", help="Campaign configuration JSON file(s)")
+    run_parser.add_argument("--jobs", type=int, default=1, help="Number of campaigns to process in parallel")
+    run_parser.add_argument("--summary", help="Also write the JSON summary to this file")
+    run_parser.add_argument("--force-regenerate", action="store_true", help="Bypass the generation cache")
+
+    resume_parser = subparsers.add_parser("resume", help="Resume interrupted generation jobs")
+    resume_parser.add_argument("campaign_ids", nargs="*", help="Campaign ID(s) to resume (default: all)")
+
+    translate_parser = subparsers.add_parser("translate", help="Bulk-translate messages for regions into the translations file")
+    translate_parser.add_argument("messages", nargs="*", help="Message(s) to translate")
+    translate_parser.add_argument("--messages-file", help="Text file with one message per line, or a JSON list of messages")
+    translate_parser.add_argument("--regions", nargs="+", help="Region key(s) from config/regions.yaml (default: all)")
+
+    args = parser.parse_args(argv)
+
+    # Image workers start on the first image job; stop them before exiting so their
+    # finalizers do not run during interpreter shutdown
+    try:
+        if args.command == "run":
+            summary = run_campaigns_headless(args.configs, jobs=args.jobs, force_regenerate=args.force_regenerate)
+            summary_json = json.dumps(summary, indent=2, ensure_ascii=False)
+            print(summary_json)
+            if args.summary:
+                Path(args.summary).write_text(summary_json, encoding="utf-8")
+            return 0 if summary["failed"] == 0 else 1
+
+        if args.command == "translate":
+            messages = list(args.messages)
+            if args.messages_file:
+                text = Path(args.messages_file).read_text(encoding="utf-8")
+                messages += json.loads(text) if args.messages_file.endswith(".json") else text.splitlines()
+            if not messages:
+                parser.error("translate needs at least one message or --messages-file")
+            summary = bulk_translate(messages, args.regions)
+            print(json.dumps(summary, indent=2, ensure_ascii=False))
+            return 0 if not summary["failures"] else 1
+
+        if args.command == "resume":
+            for campaign_id in args.campaign_ids or [None]:
+                print(resume_job_runs(campaign_id))
+            return 0 if not any(get_unfinished_job_runs(campaign_id) for campaign_id in args.campaign_ids or [None]) else 1
+
+        # Pick up jobs interrupted by a previous server process in the background
+        if AUTO_RESUME_JOBS and get_unfinished_job_runs():
+            print("Resuming unfinished generation jobs in the background...")
+            threading.Thread(target=resume_job_runs, name="job-resume", daemon=True).start()
+
+        # Index the product catalog once up front; later lookups only re-check mtimes
+        refresh_product_catalog(full=True)
+        threading.Thread(target=warm_image_pool, name="image-pool-warmup", daemon=True).start()
+
+        app = create_interface()
+        # Use PORT environment variable if available, otherwise default to 7860
+        port = int(os.environ.get("PORT", 7860))
+        app.launch(server_name="0.0.0.0", server_port=port, allowed_paths=[str(THUMBNAIL_DIR)])
+        return 0
+    finally:
+        shutdown_image_pool()
+
+
 if __name__ == "__main__":
-    app = create_interface()
-    # Use PORT environment variable if available, otherwise default to 7860
-    port = int(os.environ.get("PORT", 7860))
-    app.launch(server_name="0.0.0.0", server_port=port)
+    sys.exit(main())